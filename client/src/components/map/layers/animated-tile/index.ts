@@ -15,6 +15,35 @@ export interface AnimatedTileProps extends LayerProps {
   frame: number;
 }
 
+/**
+ * Draw every APNG frame onto the full tile, following its offset and dispose/blend ops.
+ * Frames can store only the area that changed since the previous one, so each frame's own
+ * image is not enough to display it.
+ */
+const composeFrames = async (apng: { width: number; height: number; frames: any[] }) => {
+  const canvas = new OffscreenCanvas(apng.width, apng.height);
+  const ctx = canvas.getContext('2d');
+  if (!ctx) return null;
+
+  const frames = [];
+  for (const f of apng.frames) {
+    const image = await createImageBitmap(f.imageData);
+    // Dispose op 2 (previous): restore the area once the frame has been shown
+    const previous = f.disposeOp === 2 ? ctx.getImageData(f.left, f.top, f.width, f.height) : null;
+    // Blend op 0 (source): the frame replaces the area instead of being drawn over it
+    if (f.blendOp === 0) ctx.clearRect(f.left, f.top, f.width, f.height);
+    ctx.drawImage(image, f.left, f.top);
+
+    frames.push({ ...f, bitmapData: await createImageBitmap(canvas) });
+
+    // Dispose op 1 (background): clear the area once the frame has been shown
+    if (f.disposeOp === 1) ctx.clearRect(f.left, f.top, f.width, f.height);
+    if (previous) ctx.putImageData(previous, f.left, f.top);
+  }
+
+  return frames;
+};
+
 export class AnimatedTile {
   constructor({ id, source, visibility = true, opacity = 1, frame = 0 }: AnimatedTileProps) {
     return new TileLayer({
@@ -48,12 +77,7 @@ export class AnimatedTile {
               return null;
             }
 
-            return apng.frames.map((f: any) => {
-              return {
-                ...f,
-                bitmapData: createImageBitmap(f.imageData),
-              };
-            });
+            return composeFrames(apng);
           });
       },
       renderSubLayers: (sl: any) => {
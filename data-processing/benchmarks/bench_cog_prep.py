@@ -0,0 +1,71 @@
+"""
+Benchmark the COG preparation stage of ``RasterioEngine``.
+
+Tiles a synthetic stack of striped GeoTIFFs without overviews directly, then with
+``prepare_cogs`` on a cold and on a warm COG cache, and prints the time of each run.
+
+Usage:
+    python benchmarks/bench_cog_prep.py --frames 4 --size 8192 --max-z 8
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import linear_colormap, make_frame_stack
+
+from data_processing.animated_tiles import RasterioEngine
+
+
+def run(input_folder: Path, output_folder: Path, max_z: int, **options) -> tuple:
+    """
+    Generate the per-frame tiles and return (tiles written, elapsed seconds).
+    """
+    shutil.rmtree(output_folder, ignore_errors=True)
+    engine = RasterioEngine(
+        str(input_folder),
+        str(output_folder),
+        2,
+        max_z,
+        linear_colormap(),
+        0,
+        255,
+        None,
+        "YYYY",
+        force=True,
+        **options,
+    )
+    start = time.perf_counter()
+    engine.generate_tiles()
+    elapsed = time.perf_counter() - start
+    return sum(1 for _ in Path(output_folder).rglob("*.png")), elapsed
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=4)
+    parser.add_argument("--size", type=int, default=8192)
+    parser.add_argument("--max-z", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_folder = make_frame_stack(
+            Path(tmp) / "frames", frames=args.frames, size=args.size, tiled=False
+        )
+        cache = Path(tmp) / "cogs"
+        for label, options in (
+            ("striped", {}),
+            ("COG, cold cache", {"prepare_cogs": True, "cog_cache_dir": cache}),
+            ("COG, warm cache", {"prepare_cogs": True, "cog_cache_dir": cache}),
+        ):
+            tiles, elapsed = run(input_folder, Path(tmp) / "tiles", args.max_z, **options)
+            print(f"{label:>15}: {tiles} tiles in {elapsed:.2f}s ({tiles / elapsed:.1f} tiles/s)")
+
+
+if __name__ == "__main__":
+    main()
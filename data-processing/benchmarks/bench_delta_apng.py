@@ -0,0 +1,92 @@
+"""
+Compare full-frame and delta-frame APNG encoding of animated tiles.
+
+Renders the per-frame tiles of a layer once, then assembles every tile's APNG with each
+encoding and prints the total size and encode time. Uses a layer of an animated config when
+``--config`` and ``--layer`` are given (its source GeoTIFFs must be available), otherwise a
+synthetic stack where only part of each frame changes.
+
+Usage:
+    python benchmarks/bench_delta_apng.py --config src/animated_config.yaml \\
+        --layer mongolia_iron_dzud_frost_days --max-z 7
+    python benchmarks/bench_delta_apng.py --frames 10 --changing 0.3
+"""
+
+import argparse
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import yaml
+from synthetic import linear_colormap, make_frame_stack
+
+from data_processing.animated_tiles import RasterioEngine
+from data_processing.process_apng import _build_colormap, _resolve_path
+from data_processing.utils import build_apng
+
+
+def layer_engine(args, output_folder: Path) -> RasterioEngine:
+    """
+    Create the engine of a config layer, or of a synthetic stack.
+    """
+    if args.config:
+        config_path = Path(args.config).resolve()
+        layer = yaml.safe_load(config_path.read_text())["layers"][args.layer]
+        return RasterioEngine(
+            _resolve_path(config_path.parent, layer["input_folder"]),
+            str(output_folder),
+            int(layer["min_z"]),
+            args.max_z or int(layer["max_z"]),
+            _build_colormap(layer),
+            float(layer["vmin"]),
+            float(layer["vmax"]),
+            None,
+            layer.get("date_format"),
+        )
+
+    input_folder = make_frame_stack(
+        output_folder.parent / "frames", frames=args.frames, size=1024, changing=args.changing
+    )
+    return RasterioEngine(
+        str(input_folder), str(output_folder), 2, args.max_z or 8, linear_colormap(), 0, 255
+    )
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config")
+    parser.add_argument("--layer")
+    parser.add_argument("--max-z", type=int, help="Override the layer's max_z")
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--changing", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_folder = Path(tmp) / "tiles"
+        engine = layer_engine(args, output_folder)
+        engine.generate_tiles()
+
+        # Every tile's frames, with the blank frame for those that were skipped
+        tiles = defaultdict(dict)
+        for path in output_folder.glob("*/*/*_*.png"):
+            y, n = path.stem.split("_")
+            tiles[(path.parent, y)][int(n)] = path.read_bytes()
+        frames = [
+            [tile.get(n, engine.blank_png) for n in range(engine.num_frames)]
+            for tile in tiles.values()
+        ]
+
+    print(f"{len(frames)} tiles, {engine.num_frames} frames")
+    for label, delta in (("full", False), ("delta", True)):
+        start = time.perf_counter()
+        size = sum(len(build_apng(tile, delta)) for tile in frames)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>6}: {size / 1e6:.2f} MB, encoded in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
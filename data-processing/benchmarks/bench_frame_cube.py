@@ -0,0 +1,70 @@
+"""
+Benchmark the frame cube preparation stage of ``RasterioEngine``.
+
+Tiles a synthetic stack in tile-major mode from the frame files, then with ``frame_cube``
+on a cold and on a warm cube cache, and prints the time of each run.
+
+Usage:
+    python benchmarks/bench_frame_cube.py --frames 24 --size 4096 --max-z 9
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import linear_colormap, make_frame_stack
+
+from data_processing.animated_tiles import RasterioEngine
+
+
+def run(input_folder: Path, output_folder: Path, max_z: int, **options) -> tuple:
+    """
+    Generate the APNG tiles and return (tiles written, elapsed seconds).
+    """
+    shutil.rmtree(output_folder, ignore_errors=True)
+    engine = RasterioEngine(
+        str(input_folder),
+        str(output_folder),
+        2,
+        max_z,
+        linear_colormap(),
+        0,
+        255,
+        None,
+        "YYYY",
+        "tile_major",
+        force=True,
+        **options,
+    )
+    start = time.perf_counter()
+    engine.generate_tiles()
+    elapsed = time.perf_counter() - start
+    return sum(1 for _ in Path(output_folder).rglob("*.png")), elapsed
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=24)
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--max-z", type=int, default=9)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_folder = make_frame_stack(Path(tmp) / "frames", frames=args.frames, size=args.size)
+        cube_dir = Path(tmp) / "cube"
+        for label, options in (
+            ("frame files", {}),
+            ("cube, cold cache", {"frame_cube": True, "cube_dir": cube_dir}),
+            ("cube, warm cache", {"frame_cube": True, "cube_dir": cube_dir}),
+        ):
+            tiles, elapsed = run(input_folder, Path(tmp) / "tiles", args.max_z, **options)
+            print(f"{label:>16}: {tiles} tiles in {elapsed:.2f}s ({tiles / elapsed:.1f} tiles/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark metatile reads of the animated tile engines.
+
+Tiles a synthetic stack with tiles read one by one, then with 4x4 and 8x8 metatiles, and
+prints the time of each run and whether its tiles are byte-identical to the first run.
+
+Usage:
+    python benchmarks/bench_metatile.py --frames 4 --size 4096 --max-z 9 --engine rasterio
+"""
+
+import argparse
+import hashlib
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import linear_colormap, make_frame_stack
+
+from data_processing.animated_tiles import RasterioEngine, XArrayEngine
+
+
+def open_stack(folder: Path):
+    """
+    Open a frame stack as the (time, y, x) DataArray the xarray engine expects.
+    """
+    import rioxarray  # noqa: F401
+    import xarray as xr
+
+    paths = sorted(folder.glob("*.tif"))
+    arrays = [xr.open_dataarray(p, engine="rasterio").squeeze("band", drop=True) for p in paths]
+    stack = xr.concat(arrays, dim="time").assign_coords(time=range(len(paths)))
+    return stack.where(stack != stack.rio.nodata)
+
+
+def run(engine: str, input_folder: Path, output_folder: Path, max_z: int, metatile: int):
+    """
+    Generate the per-frame tiles and return (hashes of the tiles by path, elapsed seconds).
+    """
+    shutil.rmtree(output_folder, ignore_errors=True)
+    if engine == "xarray":
+        engine_class, data = XArrayEngine, open_stack(input_folder)
+    else:
+        engine_class, data = RasterioEngine, str(input_folder)
+    tiler = engine_class(
+        data,
+        str(output_folder),
+        2,
+        max_z,
+        linear_colormap(),
+        0,
+        255,
+        None,
+        "YYYY",
+        force=True,
+        metatile=metatile,
+    )
+    start = time.perf_counter()
+    tiler.generate_tiles()
+    elapsed = time.perf_counter() - start
+    hashes = {
+        path.relative_to(output_folder): hashlib.sha256(path.read_bytes()).hexdigest()
+        for path in Path(output_folder).rglob("*.png")
+    }
+    return hashes, elapsed
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=4)
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--max-z", type=int, default=9)
+    parser.add_argument("--engine", choices=("rasterio", "xarray"), default="rasterio")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_folder = make_frame_stack(Path(tmp) / "frames", frames=args.frames, size=args.size)
+        reference = None
+        for metatile in (1, 4, 8):
+            hashes, elapsed = run(
+                args.engine, input_folder, Path(tmp) / "tiles", args.max_z, metatile
+            )
+            reference = reference or hashes
+            identical = "identical" if hashes == reference else "DIFFERENT"
+            print(
+                f"metatile {metatile}: {len(hashes)} tile frames in {elapsed:.2f}s "
+                f"({len(hashes) / elapsed:.1f}/s), {identical}"
+            )
+
+
+if __name__ == "__main__":
+    main()
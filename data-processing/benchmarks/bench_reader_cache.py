@@ -0,0 +1,63 @@
+"""
+Benchmark the per-worker reader cache of ``RasterioEngine``.
+
+Renders the same synthetic multi-frame stack with the cache disabled (one ``Reader`` per tile,
+the previous behaviour) and enabled, and prints tiles/sec for both runs.
+
+Usage:
+    python benchmarks/bench_reader_cache.py --frames 6 --size 2048 --max-z 9
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import linear_colormap, make_frame_stack
+
+from data_processing.animated_tiles import RasterioEngine
+
+
+def run(input_folder: Path, output_folder: Path, max_z: int, reader_cache_size: int) -> tuple:
+    """
+    Generate the per-frame tiles and return (tiles written, elapsed seconds).
+    """
+    engine = RasterioEngine(
+        str(input_folder),
+        str(output_folder),
+        2,
+        max_z,
+        linear_colormap(),
+        0,
+        255,
+        None,
+        "YYYY",
+        reader_cache_size=reader_cache_size,
+    )
+    start = time.perf_counter()
+    engine.generate_tiles()
+    elapsed = time.perf_counter() - start
+    return sum(1 for _ in Path(output_folder).rglob("*.png")), elapsed
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=4)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--max-z", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        input_folder = make_frame_stack(tmp / "frames", frames=args.frames, size=args.size)
+
+        for label, cache_size in (("no cache", 0), ("reader cache", 8)):
+            tiles, elapsed = run(input_folder, tmp / f"out_{cache_size}", args.max_z, cache_size)
+            print(f"{label:>12}: {tiles} tiles in {elapsed:.2f}s ({tiles / elapsed:.1f} tiles/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark the tile render path of the animated tile engines.
+
+Reads tiles from a synthetic stack once, then renders them with the rio-tiler path (rescale,
+``ImageData.render`` and a PIL re-encode, the previous behaviour) and with the lookup-table
+path, and prints tiles/sec and CPU time per tile for both.
+
+Usage:
+    python benchmarks/bench_render.py --size 2048 --zoom 8 --repeat 3
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import mercantile
+import numpy as np
+from rio_tiler.io import Reader
+from rio_tiler.models import ImageData
+from synthetic import linear_colormap, make_frame_stack
+
+from data_processing.animated_tiles import TileEngine
+
+
+def read_tiles(path: Path, zoom: int) -> list:
+    """
+    Read every tile of a frame at one zoom level.
+    """
+    with Reader(path) as src:
+        tiles = mercantile.tiles(*src.get_geographic_bounds("epsg:4326"), zooms=zoom)
+        return [src.tile(t.x, t.y, t.z, tilesize=TileEngine.TILE_SIZE).array for t in tiles]
+
+
+def run(render, arrays: list, repeat: int) -> tuple:
+    """
+    Render copies of the tile arrays and return (tiles rendered, wall seconds, CPU seconds).
+    """
+    wall, cpu = 0.0, 0.0
+    for _ in range(repeat):
+        # Rendering rescales the array in place, so every pass gets fresh copies
+        images = [ImageData(np.ma.masked_array(a.data.copy(), mask=a.mask.copy())) for a in arrays]
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        for img in images:
+            render(img)
+        wall += time.perf_counter() - start_wall
+        cpu += time.process_time() - start_cpu
+    return len(arrays) * repeat, wall, cpu
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--zoom", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_folder = make_frame_stack(Path(tmp) / "frames", frames=1, size=args.size)
+        arrays = read_tiles(input_folder / "frame_2000.tif", args.zoom)
+
+    engine = TileEngine(None, None, 0, args.zoom, linear_colormap(), 0, 255)
+    for label, render in (
+        ("rio-tiler", engine._render_rio_tiler),
+        ("lookup table", engine._render),
+    ):
+        tiles, wall, cpu = run(render, arrays, args.repeat)
+        print(
+            f"{label:>12}: {tiles} tiles in {wall:.2f}s ({tiles / wall:.1f} tiles/s, "
+            f"{cpu / tiles * 1000:.2f} ms CPU/tile)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+Micro-benchmark suite of the hot functions of the pipeline, on synthetic inputs.
+
+Generates GeoTIFF stacks, class rasters, QML styles, a clipping polygon, mosaic quadrants and
+a CSV locally, sized from ``small`` to ``national`` scale, then times:
+
+- ``RasterProcessor.apply_styles`` with INTERPOLATED, DISCRETE and PALETTE styles
+- ``_normalize_to_uint8``
+- ``AnimatedTiles`` with the rasterio and the xarray engine
+- ``create_apngs`` on pre-rendered frame tiles
+- ``merge_tifs``, ``resample_raster``, ``clip_rasters_by_vector`` and ``csv_to_json``
+
+Every benchmark runs ``--repeat`` times after an untimed setup, and the results are written
+as JSON (commit, machine, per-benchmark times) so two commits can be compared with
+``--compare``. A benchmark whose module cannot be imported is recorded as an error instead
+of aborting the suite.
+
+Usage:
+    python benchmarks/run_suite.py --size small --repeat 3
+    python benchmarks/run_suite.py --size medium --only apply_styles,create_apngs
+    python benchmarks/run_suite.py --compare results/old.json results/new.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+from synthetic import (
+    linear_colormap,
+    make_class_raster,
+    make_csv,
+    make_frame_stack,
+    make_mosaic,
+    make_qml,
+    make_vector,
+)
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Frame width/height in pixels and number of frames of every size. The synthetic frames
+# cover 10x10 degrees, so ``national`` is close to a ~50 m national raster.
+SIZES = {
+    "small": {"size": 512, "frames": 4},
+    "medium": {"size": 2048, "frames": 4},
+    "large": {"size": 8192, "frames": 4},
+    "national": {"size": 20480, "frames": 2},
+}
+
+BOUNDS = (100.0, 40.0, 110.0, 50.0)
+
+QML_MODES = ("INTERPOLATED", "DISCRETE", "PALETTE")
+
+
+class Case(NamedTuple):
+    """
+    A benchmark: ``run`` is timed, ``setup`` runs untimed before every repetition.
+    """
+
+    run: Callable[[], object]
+    setup: Optional[Callable[[], object]] = None
+
+
+def native_max_z(size: int) -> int:
+    """
+    The zoom level at which a 256 px tile matches the resolution of the synthetic frames.
+    """
+    degrees_per_pixel = (BOUNDS[2] - BOUNDS[0]) / size
+    return max(2, math.ceil(math.log2(360 / (256 * degrees_per_pixel))))
+
+
+def generate_inputs(data_dir: Path, size: str) -> dict:
+    """
+    Generate (or reuse, when already in ``data_dir``) the synthetic inputs of a size.
+
+    Returns:
+        dict: Paths of the inputs.
+    """
+    spec = SIZES[size]
+    root = data_dir / size
+    done = root / ".complete"
+    inputs = {
+        "frames": root / "frames",
+        "frame": root / "frames" / "frame_2000.tif",
+        "classes": root / "classes.tif",
+        "mosaic": root / "mosaic",
+        "vector": root / "clip.geojson",
+        "csv": root / "series.csv",
+        **{f"qml_{mode.lower()}": root / f"{mode.lower()}.qml" for mode in QML_MODES},
+    }
+    if done.exists():
+        return inputs
+
+    shutil.rmtree(root, ignore_errors=True)
+    make_frame_stack(inputs["frames"], frames=spec["frames"], size=spec["size"], bounds=BOUNDS)
+    make_class_raster(inputs["classes"], size=spec["size"], classes=20, bounds=BOUNDS)
+    make_mosaic(inputs["mosaic"], size=spec["size"], bounds=BOUNDS)
+    make_vector(inputs["vector"], bounds=BOUNDS)
+    make_csv(inputs["csv"], rows=spec["size"] * 10)
+    make_qml(inputs["qml_interpolated"], "INTERPOLATED")
+    make_qml(inputs["qml_discrete"], "DISCRETE")
+    make_qml(inputs["qml_palette"], "PALETTE", stops=20)
+    done.touch()
+    return inputs
+
+
+def _apply_styles(mode: str) -> Callable:
+    def case(inputs: dict, work: Path, size: str) -> Case:
+        from data_processing.raster_processor import RasterProcessor
+
+        source = inputs["classes"] if mode == "PALETTE" else inputs["frame"]
+        processor = RasterProcessor(
+            source,
+            inputs[f"qml_{mode.lower()}"],
+            work / f"styled_{mode.lower()}.tif",
+            upload=False,
+            create_mbtiles=False,
+        )
+        return Case(processor.apply_styles)
+
+    return case
+
+
+def _normalize_to_uint8(inputs: dict, work: Path, size: str) -> Case:
+    from data_processing.process_layers import _normalize_to_uint8
+
+    return Case(lambda: _normalize_to_uint8(inputs["frame"], work / "normalized.tif"))
+
+
+def _animated_tiles(engine: str) -> Callable:
+    def case(inputs: dict, work: Path, size: str) -> Case:
+        from data_processing.animated_tiles import AnimatedTiles
+
+        data = str(inputs["frames"])
+        if engine == "xarray":
+            data = _open_stack(inputs["frames"])
+        output = work / f"tiles_{engine}"
+        tiles = AnimatedTiles(
+            data,
+            output,
+            2,
+            native_max_z(SIZES[size]["size"]),
+            linear_colormap(),
+            0,
+            255,
+            engine=engine,
+            date_format="YYYY",
+            force=True,
+        )
+        return Case(tiles.create, lambda: shutil.rmtree(output, ignore_errors=True))
+
+    return case
+
+
+def _open_stack(folder: Path):
+    """
+    Open a frame stack as the (time, y, x) DataArray the xarray engine expects.
+    """
+    import rioxarray  # noqa: F401
+    import xarray as xr
+
+    paths = sorted(folder.glob("*.tif"))
+    arrays = [xr.open_dataarray(p, engine="rasterio").squeeze("band", drop=True) for p in paths]
+    stack = xr.concat(arrays, dim="time").assign_coords(time=range(len(paths)))
+    return stack.where(stack != stack.rio.nodata)
+
+
+def _create_apngs(inputs: dict, work: Path, size: str) -> Case:
+    from data_processing.animated_tiles import RasterioEngine
+    from data_processing.utils import create_apngs
+
+    # Render the frame tiles once, every repetition assembles a fresh copy of them
+    template = work / "frame_tiles"
+    engine = RasterioEngine(
+        str(inputs["frames"]),
+        str(template),
+        2,
+        native_max_z(SIZES[size]["size"]),
+        linear_colormap(),
+        0,
+        255,
+        None,
+        "YYYY",
+        force=True,
+    )
+    engine.generate_tiles()
+    tile_dir = work / "apngs"
+
+    def setup():
+        shutil.rmtree(tile_dir, ignore_errors=True)
+        shutil.copytree(template, tile_dir)
+
+    return Case(
+        lambda: create_apngs(tile_dir, engine.num_frames, engine.blank_png, engine.delta_frames),
+        setup,
+    )
+
+
+def _merge_tifs(inputs: dict, work: Path, size: str) -> Case:
+    from data_processing.utils import merge_tifs
+
+    return Case(lambda: merge_tifs(inputs["mosaic"], work / "merged.tif"))
+
+
+def _resample_raster(inputs: dict, work: Path, size: str) -> Case:
+    from data_processing.utils import resample_raster
+
+    return Case(lambda: resample_raster(inputs["frame"], work / "resampled.tif", scale_factor=4))
+
+
+def _clip_rasters_by_vector(inputs: dict, work: Path, size: str) -> Case:
+    from data_processing.utils import clip_rasters_by_vector
+
+    output = work / "clipped"
+    return Case(
+        lambda: clip_rasters_by_vector(inputs["frames"], inputs["vector"], output),
+        lambda: shutil.rmtree(output, ignore_errors=True),
+    )
+
+
+def _csv_to_json(inputs: dict, work: Path, size: str) -> Case:
+    from data_processing.utils import csv_to_json
+
+    return Case(lambda: csv_to_json(inputs["csv"], work / "series.json", skiprows=1))
+
+
+BENCHMARKS = {
+    **{f"apply_styles_{mode.lower()}": _apply_styles(mode) for mode in QML_MODES},
+    "normalize_to_uint8": _normalize_to_uint8,
+    "animated_tiles_rasterio": _animated_tiles("rasterio"),
+    "animated_tiles_xarray": _animated_tiles("xarray"),
+    "create_apngs": _create_apngs,
+    "merge_tifs": _merge_tifs,
+    "resample_raster": _resample_raster,
+    "clip_rasters_by_vector": _clip_rasters_by_vector,
+    "csv_to_json": _csv_to_json,
+}
+
+
+def run_benchmark(name: str, inputs: dict, size: str, repeat: int, verbose: bool) -> dict:
+    """
+    Set up and time one benchmark ``repeat`` times.
+
+    Returns:
+        dict: "status" ("ok" or "error"), the times in seconds and their min and median, or
+        the error.
+    """
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as tmp:
+        try:
+            with quiet:
+                case = BENCHMARKS[name](inputs, Path(tmp), size)
+                times = []
+                for _ in range(repeat):
+                    if case.setup:
+                        case.setup()
+                    start = time.perf_counter()
+                    case.run()
+                    times.append(time.perf_counter() - start)
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc() if verbose else None,
+            }
+    return {
+        "status": "ok",
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+    }
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True, cwd=RESULTS_DIR.parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def environment() -> dict:
+    """
+    The commit and machine the suite runs on.
+    """
+    return {
+        "commit": _git("rev-parse", "HEAD") or None,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+    }
+
+
+def compare(old_path: Path, new_path: Path):
+    """
+    Print the median time of every benchmark in two result files and their ratio.
+    """
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"old: {old.get('commit', '?')[:8]} ({old['size']})")
+    print(f"new: {new.get('commit', '?')[:8]} ({new['size']})")
+    print(f"{'benchmark':<28}{'old (s)':>10}{'new (s)':>10}{'new/old':>10}")
+    for name in sorted(set(old["benchmarks"]) | set(new["benchmarks"])):
+        a = old["benchmarks"].get(name, {}).get("median")
+        b = new["benchmarks"].get(name, {}).get("median")
+        ratio = f"{b / a:>10.2f}" if a and b else f"{'-':>10}"
+        print(
+            f"{name:<28}"
+            f"{f'{a:.3f}' if a is not None else '-':>10}"
+            f"{f'{b:.3f}' if b is not None else '-':>10}"
+            f"{ratio}"
+        )
+
+
+def main():
+    """
+    Run the suite, or compare two result files.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="Comma-separated benchmark names (prefixes match)")
+    parser.add_argument("--output", type=Path, help="Result file. Defaults to results/")
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "esa_benchmarks",
+        help="Where the synthetic inputs are generated and reused from",
+    )
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"))
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline output")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names = list(BENCHMARKS)
+    if args.only:
+        prefixes = args.only.split(",")
+        names = [n for n in names if any(n.startswith(p) for p in prefixes)]
+
+    print(f"Generating {args.size} inputs in {args.data_dir}...")
+    start = time.perf_counter()
+    inputs = generate_inputs(args.data_dir, args.size)
+    print(f"  ready in {time.perf_counter() - start:.1f}s")
+
+    results = {}
+    for name in names:
+        result = run_benchmark(name, inputs, args.size, args.repeat, args.verbose)
+        results[name] = result
+        if result["status"] == "ok":
+            print(f"{name:<28} median {result['median']:8.3f}s  min {result['min']:8.3f}s")
+        else:
+            print(f"{name:<28} {result['error']}")
+            if result["traceback"]:
+                print(result["traceback"])
+
+    report = {
+        **environment(),
+        "size": args.size,
+        "pixels": SIZES[args.size]["size"],
+        "frames": SIZES[args.size]["frames"],
+        "repeat": args.repeat,
+        "benchmarks": results,
+    }
+    output = args.output
+    if output is None:
+        commit = (report["commit"] or "nogit")[:8] + ("-dirty" if report["dirty"] else "")
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        output = RESULTS_DIR / f"{args.size}-{commit}-{stamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Helpers to generate synthetic inputs for the benchmarks.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_bounds
+
+# Make the pipeline packages importable when running the benchmarks as scripts
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
+
+
+def make_frame_stack(
+    folder: Path,
+    frames: int = 4,
+    size: int = 1024,
+    bounds: tuple = (100.0, 40.0, 110.0, 50.0),
+    nodata: float = -9999.0,
+    seed: int = 0,
+    changing: float = 1.0,
+    tiled: bool = True,
+) -> Path:
+    """
+    Write a stack of single-band float32 GeoTIFFs named like real animated inputs
+    (``frame_YYYY.tif``).
+
+    Args:
+        folder (Path): Output folder. Created if missing.
+        frames (int): Number of frames to write.
+        size (int): Width and height of each frame in pixels.
+        bounds (tuple): Frame bounds in EPSG:4326 (west, south, east, north).
+        nodata (float): Nodata value. The top rows of each frame are set to it.
+        seed (int): Seed for the random noise added to every frame.
+        changing (float): Fraction of the columns, from the left, that change from one frame
+            to the next. The other columns keep the values of the first frame.
+        tiled (bool): Write 256x256 tiles; otherwise strips, without overviews either way.
+
+    Returns:
+        Path: The output folder.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    rows, cols = np.mgrid[0:size, 0:size]
+    base = (np.sin(rows / 50.0) + np.cos(cols / 70.0) + 2) * 50
+
+    profile = {
+        "driver": "GTiff",
+        "height": size,
+        "width": size,
+        "count": 1,
+        "dtype": "float32",
+        "crs": "EPSG:4326",
+        "transform": from_bounds(*bounds, size, size),
+        "nodata": nodata,
+    }
+    if tiled:
+        profile.update(tiled=True, blockxsize=256, blockysize=256)
+
+    first = None
+    for n in range(frames):
+        data = (base + n * 5 + rng.normal(0, 2, base.shape)).astype("float32")
+        if first is None:
+            first = data
+        data[:, int(size * changing) :] = first[:, int(size * changing) :]
+        data[: size // 10] = nodata
+        with rasterio.open(folder / f"frame_{2000 + n}.tif", "w", **profile) as dst:
+            dst.write(data, 1)
+
+    return folder
+
+
+def linear_colormap() -> dict:
+    """
+    Return the 256-entry colormap of a typical continuous animated layer.
+    """
+    from data_processing.process_apng import _build_colormap
+
+    return _build_colormap(
+        {
+            "vmin": 0,
+            "vmax": 255,
+            "colormap": {"type": "linear", "colors": ["#f1eef6", "#579ec8", "#045a8d"]},
+        }
+    )
+
+
+def make_class_raster(
+    path: Path,
+    size: int = 1024,
+    classes: int = 20,
+    bounds: tuple = (100.0, 40.0, 110.0, 50.0),
+    nodata: int = -1,
+) -> Path:
+    """
+    Write a single-band int16 GeoTIFF of land-cover-like classes ``0..classes - 1``, with
+    patches of a few hundred pixels and the top rows set to nodata.
+
+    Returns:
+        Path: The GeoTIFF file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows, cols = np.mgrid[0:size, 0:size]
+    data = ((np.sin(rows / 37.0) * np.cos(cols / 23.0) + 1) / 2 * classes).astype("int16")
+    data = np.clip(data, 0, classes - 1)
+    data[: size // 10] = nodata
+
+    profile = {
+        "driver": "GTiff",
+        "height": size,
+        "width": size,
+        "count": 1,
+        "dtype": "int16",
+        "crs": "EPSG:4326",
+        "transform": from_bounds(*bounds, size, size),
+        "nodata": nodata,
+        "tiled": True,
+        "blockxsize": 256,
+        "blockysize": 256,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+    return path
+
+
+def make_qml(path: Path, mode: str, stops: int = 20, vmin: float = 0, vmax: float = 250) -> Path:
+    """
+    Write a QGIS raster style with ``stops`` color entries between ``vmin`` and ``vmax``.
+
+    Args:
+        path (Path): The QML file.
+        mode (str): "DISCRETE" or "INTERPOLATED" for a color ramp shader, "PALETTE" for a
+            paletted renderer with one entry per integer value from ``vmin``.
+
+    Returns:
+        Path: The QML file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(stops)
+    colors = [
+        "#{:02x}{:02x}{:02x}".format(*(int(v) for v in rng.integers(0, 256, 3)))
+        for _ in range(stops)
+    ]
+
+    if mode == "PALETTE":
+        entries = "\n".join(
+            f'<paletteEntry value="{int(vmin) + i}" color="{color}" alpha="255" label="{i}"/>'
+            for i, color in enumerate(colors)
+        )
+        renderer = f'<rasterrenderer type="paletted" band="1"><colorPalette>\n{entries}\n'
+        renderer += "</colorPalette></rasterrenderer>"
+    else:
+        values = np.linspace(vmin, vmax, stops)
+        items = "\n".join(
+            f'<item value="{value}" color="{color}" alpha="255" label="{value}"/>'
+            for value, color in zip(values, colors, strict=True)
+        )
+        renderer = (
+            '<rasterrenderer type="singlebandpseudocolor" band="1"><rastershader>'
+            f'<colorrampshader colorRampType="{mode}" classificationMode="1">\n{items}\n'
+            "</colorrampshader></rastershader></rasterrenderer>"
+        )
+
+    path.write_text(f"<qgis><pipe>{renderer}</pipe></qgis>\n")
+    return path
+
+
+def make_vector(path: Path, bounds: tuple = (100.0, 40.0, 110.0, 50.0), vertices: int = 64) -> Path:
+    """
+    Write a GeoJSON polygon, a wobbly circle inscribed in ``bounds``, to clip rasters with.
+
+    Returns:
+        Path: The GeoJSON file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    west, south, east, north = bounds
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radius = 0.45 * (1 + 0.1 * np.sin(angles * 5))
+    ring = [
+        [
+            (west + east) / 2 + r * (east - west) * np.cos(a),
+            (south + north) / 2 + r * (north - south) * np.sin(a),
+        ]
+        for a, r in zip(angles, radius, strict=True)
+    ]
+    ring.append(ring[0])
+    feature = {
+        "type": "Feature",
+        "properties": {},
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+    }
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": [feature]}))
+    return path
+
+
+def make_mosaic(folder: Path, size: int = 1024, bounds: tuple = (100.0, 40.0, 110.0, 50.0)) -> Path:
+    """
+    Write the four uint8 quadrants of a ``size`` x ``size`` raster as separate GeoTIFFs.
+
+    Returns:
+        Path: The folder holding the quadrants.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    west, south, east, north = bounds
+    half = size // 2
+    mid_x, mid_y = (west + east) / 2, (south + north) / 2
+    rows, cols = np.mgrid[0:half, 0:half]
+    for i, (x0, y0, x1, y1) in enumerate(
+        [
+            (west, mid_y, mid_x, north),
+            (mid_x, mid_y, east, north),
+            (west, south, mid_x, mid_y),
+            (mid_x, south, east, mid_y),
+        ]
+    ):
+        data = ((rows + cols + i * 64) % 255 + 1).astype("uint8")
+        profile = {
+            "driver": "GTiff",
+            "height": half,
+            "width": half,
+            "count": 1,
+            "dtype": "uint8",
+            "crs": "EPSG:4326",
+            "transform": from_bounds(x0, y0, x1, y1, half, half),
+            "nodata": 0,
+            "tiled": True,
+            "blockxsize": 256,
+            "blockysize": 256,
+        }
+        with rasterio.open(folder / f"quadrant_{i}.tif", "w", **profile) as dst:
+            dst.write(data, 1)
+    return folder
+
+
+def make_csv(path: Path, rows: int = 1000) -> Path:
+    """
+    Write a two-column ``year,value`` CSV with a metadata line on top, like the chart inputs.
+
+    Returns:
+        Path: The CSV file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(rows)
+    values = np.cumsum(rng.normal(0, 1, rows))
+    lines = ["# synthetic series", "year,value"]
+    lines += [f"{1900 + i * 0.1:.1f},{v:.6f}" for i, v in enumerate(values)]
+    path.write_text("\n".join(lines) + "\n")
+    return path
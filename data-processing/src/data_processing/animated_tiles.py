@@ -4,30 +4,55 @@ Module for creating animated tiles
 
 import glob
 import io
+import json
+import multiprocessing
 import os
 import re
-import shutil
+import threading
+import time
 import warnings
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial, wraps
+from itertools import groupby
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, Iterable, Iterator, Optional
 
 import dask
 import mercantile
 import numpy as np
 import rasterio
+import shapely
 import xarray as xr
+from affine import Affine
 from PIL import Image
+from rasterio.features import geometry_mask
+from rasterio.transform import from_bounds
+from rasterio.warp import transform, transform_bounds
 from rich.console import Console
 from rich.live import Live
 from rich.spinner import Spinner
 from rio_tiler.colormap import ColorMapType
 from rio_tiler.errors import TileOutsideBounds
 from rio_tiler.io import Reader, XarrayReader
+from rio_tiler.models import ImageData
 
-from helpers.raster_ops import open_raster_in_4326
+from helpers.cog_converter import prepare_cogs
+from helpers.frame_cube import cached_frame_cube
+from helpers.raster_ops import mask_footprint, vector_footprint
 
-from .utils import clip_rasters_by_vector, create_apngs, get_files_with_years
+from .frame_catalog import FrameCatalog
+from .tile_archive import ARCHIVE_FORMATS, MBTilesArchive, archive_path, write_pmtiles
+from .tile_manifest import TileManifest, file_signature, params_key
+from .tile_stats import TileStats, current, recording
+from .utils import (
+    DEDUPE_MANIFEST,
+    build_apng,
+    create_apngs,
+    dedupe_tiles,
+)
+from .worker_budget import BudgetShare, bounded_map
 
 # Suppress specific warnings from rasterio
 warnings.filterwarnings("ignore", category=rasterio.errors.NotGeoreferencedWarning)
@@ -36,6 +61,34 @@ warnings.filterwarnings("ignore", category=rasterio.errors.NotGeoreferencedWarni
 console = Console()
 
 
+def _mean_reducer(blocks: np.ma.MaskedArray) -> np.ma.MaskedArray:
+    """
+    Average the valid pixels of each 2x2 block. For continuous layers.
+    """
+    return blocks.mean(axis=(2, 4))
+
+
+def _mode_reducer(blocks: np.ma.MaskedArray) -> np.ma.MaskedArray:
+    """
+    Take the most frequent valid value of each 2x2 block, preferring the top-left pixel on
+    ties (nearest). For categorical layers.
+    """
+    bands, size = blocks.shape[0], blocks.shape[1]
+    values = blocks.data.transpose(0, 1, 3, 2, 4).reshape(bands, size, size, 4)
+    valid = ~np.ma.getmaskarray(blocks).transpose(0, 1, 3, 2, 4).reshape(bands, size, size, 4)
+
+    # For each pixel, the number of valid pixels of its block sharing its value
+    counts = ((values[..., :, None] == values[..., None, :]) & valid[..., None, :]).sum(axis=-1)
+    counts[~valid] = -1
+
+    best = counts.argmax(axis=-1)[..., None]
+    data = np.take_along_axis(values, best, axis=-1)[..., 0]
+    return np.ma.masked_array(data, mask=~valid.any(axis=-1))
+
+
+PYRAMID_REDUCERS = {"mean": _mean_reducer, "mode": _mode_reducer}
+
+
 class AnimatedTiles:
     """
     Class for creating animated tiles.
@@ -53,6 +106,20 @@ class AnimatedTiles:
         (only for rasterio engine). Defaults to None.
     date_format (str, optional): Expected date format in filenames. Options: "DDMMYYYY" or "YYYYMMDD".
         Defaults to "YYYYMMDD". Only used with rasterio engine.
+    mode (str, optional): Rendering order. "frame_major" writes one PNG per frame and tile and
+        assembles the APNGs in a second pass; "tile_major" renders all frames of a tile in memory
+        and writes its APNG directly. Defaults to "frame_major".
+    pyramid (bool, optional): Render only ``max_z`` from the source and build every lower zoom
+        level by 2x2 downsampling of the children's raw values. Defaults to False.
+    pyramid_reducer (str, optional): How pyramid mode downsamples: "mean" for continuous
+        layers, "mode" for categorical layers. Defaults to "mean".
+    force (bool, optional): Regenerate every tile. Otherwise a rerun only regenerates the tiles
+        that are missing or stale according to the manifest stored next to ``output_folder``.
+        Defaults to False.
+    archive (str, optional): Write the APNGs into a single ``{output_folder}.mbtiles`` or
+        ``{output_folder}.pmtiles`` archive instead of one file per tile. Defaults to None.
+    **engine_options: Additional engine-specific options forwarded to the engine
+        (e.g. ``reader_cache_size`` for the rasterio engine).
     """
 
     def __init__(
@@ -67,16 +134,38 @@ class AnimatedTiles:
         engine: str = "xarray",
         vector_file: Path = None,
         date_format: str = "YYYYMMDD",
+        mode: str = "frame_major",
+        pyramid: bool = False,
+        pyramid_reducer: str = "mean",
+        force: bool = False,
+        archive: Optional[str] = None,
+        **engine_options,
     ):
         """
         Initializes the AnimatedTiles class.
         """
         self.engine = engine
+        # Counters and timings of the last run of ``create``, None if it had nothing to do
+        self.report = None
         self.engine_class = {"xarray": XArrayEngine, "rasterio": RasterioEngine}.get(engine)
         if not self.engine_class:
             raise ValueError(f"Unsupported engine: {engine}")
         self.engine_instance = self.engine_class(
-            data, output_folder, min_z, max_z, color_map, vmin, vmax, vector_file, date_format
+            data,
+            output_folder,
+            min_z,
+            max_z,
+            color_map,
+            vmin,
+            vmax,
+            vector_file,
+            date_format,
+            mode,
+            pyramid,
+            pyramid_reducer,
+            force=force,
+            archive=archive,
+            **engine_options,
         )
 
     def create(self, time_coord="time"):
@@ -84,14 +173,97 @@ class AnimatedTiles:
         Create animated-tiles.
         """
         console.print("🎬 Creating animated tiles...", style="bold green")
+        start = time.perf_counter()
         if self.engine == "rasterio":
             self.engine_instance.generate_tiles()
         elif self.engine == "xarray":
             self.engine_instance.generate_tiles(time_coord)
-        console.print("🎨 Creating APNGs...", style="bold blue")
-        create_apngs(self.engine_instance.output_folder)
+        engine = self.engine_instance
+        if engine.up_to_date:
+            return
+        wall = {"generate": time.perf_counter() - start}
+
+        # In tile-major mode the engine already wrote the APNGs
+        if engine.mode == "frame_major":
+            console.print("🎨 Creating APNGs...", style="bold blue")
+            engine._report_progress("assembling", 0, 1)
+            timings = create_apngs(
+                engine.output_folder,
+                engine.num_frames,
+                engine.blank_png,
+                engine.delta_frames,
+                max_workers=getattr(engine, "max_workers", None),
+                archive=engine.store,
+                stats=engine.stats,
+                budget=engine.budget,
+            )
+            wall["assemble"] = timings["scan"] + timings["assemble"]
+            console.print(
+                f"⏱️ {timings['tiles']} APNGs in {timings['scan'] + timings['assemble']:.1f}s "
+                f"(scan {timings['scan']:.1f}s, assemble {timings['assemble']:.1f}s; "
+                f"worker time: read {timings['read']:.1f}s, encode {timings['encode']:.1f}s, "
+                f"write {timings['write']:.1f}s, remove {timings['remove']:.1f}s)",
+                style="bold blue",
+            )
+
+        finish = time.perf_counter()
+        engine._report_progress("finishing", 0, 1)
+        if engine.store is not None:
+            engine.finish_archive()
+        else:
+            # Look for identical tiles so they can be stored once
+            manifest = dedupe_tiles(engine.output_folder)
+            console.print(
+                f"🧮 {manifest['tiles']} tiles written, "
+                f"{len(engine.tiles) - manifest['tiles']} empty tiles skipped, "
+                f"{len(manifest['duplicates'])} duplicates "
+                f"({manifest['bytes_saved'] / 1e6:.1f} MB) listed in {DEDUPE_MANIFEST}",
+                style="bold blue",
+            )
+        engine.manifest.finish()
+        engine.manifest.close()
+        wall["finish"] = time.perf_counter() - finish
+        wall["total"] = time.perf_counter() - start
+        self._report(wall)
         console.print("✅ All animated tiles created successfully!", style="bold green")
 
+    def _report(self, wall: dict):
+        """
+        Print the counters and stage timings of the run and write them, with the wall-clock
+        time of every phase, to ``{output_folder}.report.json`` next to the output folder.
+        """
+        engine = self.engine_instance
+        output_folder = Path(engine.output_folder)
+        report = {
+            "layer": output_folder.name,
+            "engine": self.engine,
+            "mode": engine.mode,
+            "workers": getattr(engine, "max_workers", None),
+            "frames": engine.num_frames,
+            "tiles": len(engine.tiles),
+            "wall": wall,
+            **engine.stats.to_dict(),
+        }
+        report_path = output_folder.parent / f"{output_folder.name}.report.json"
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        self.report = report
+
+        counts = report["counts"]
+        console.print(
+            f"📊 {counts['attempted']} tile frames read ({counts['out_of_bounds']} out of "
+            f"bounds, {counts['failed']} failed), {counts['rendered']} rendered, "
+            f"{counts['empty']} empty; {counts['written']} tiles written in {wall['total']:.1f}s",
+            style="bold blue",
+        )
+        for stage, times in report["stages"].items():
+            console.print(
+                f"   {stage:<10} {times['total']:8.1f}s total, p50 {times['p50'] * 1e3:.1f} ms, "
+                f"p90 {times['p90'] * 1e3:.1f} ms, p99 {times['p99'] * 1e3:.1f} ms",
+                style="blue",
+            )
+        console.print(f"📝 Report written to {report_path}", style="bold blue")
+
 
 # Define a base class for tile engines
 class TileEngine:
@@ -100,6 +272,8 @@ class TileEngine:
     """
 
     TILE_SIZE = 256
+    MODES = ("frame_major", "tile_major")
+    TILE_COVERS = ("footprint", "bbox")
 
     def __init__(
         self,
@@ -112,6 +286,17 @@ class TileEngine:
         vmax: float = 30000,
         vector_file: Optional[Path] = None,
         date_format: str = "YYYYMMDD",
+        mode: str = "frame_major",
+        pyramid: bool = False,
+        pyramid_reducer: str = "mean",
+        tile_cover: str = "footprint",
+        force: bool = False,
+        delta_frames: bool = False,
+        palette: bool = False,
+        archive: Optional[str] = None,
+        metatile: int = 1,
+        budget: Optional[BudgetShare] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None,
     ):
         """
         Initialize the BaseTiler class.
@@ -124,19 +309,81 @@ class TileEngine:
         color_map (dict or sequence, optional): RGBA Color Table dictionary or sequence.
         vmin (float): The minimum value for rescaling the data.
         vmax (float): The maximum value for rescaling the data.
-        vector_file (Path, optional): Path to a vector file for clipping the rasters.
+        vector_file (Path, optional): Path to a vector file for clipping the rasters. The
+            pixels of each tile outside its geometries are masked as the tile is rendered.
         date_format (str): Expected date format in filenames ("DDMMYYYY" or "YYYYMMDD").
+        mode (str): Rendering order, "frame_major" or "tile_major".
+        pyramid (bool): Build the zoom levels below ``max_z`` from their children.
+        pyramid_reducer (str): Pyramid downsampling method, "mean" or "mode".
+        tile_cover (str): "footprint" only generates the tiles that intersect the data
+            footprint (the clipping polygon, or the valid data of every frame, of the first
+            one with the xarray engine); "bbox" generates every tile of the bounding box.
+        force (bool): Regenerate every tile, even those the manifest records as up to date.
+        delta_frames (bool): Store only the part of each APNG frame that changed since the
+            previous one.
+        palette (bool): Write 8-bit palette PNGs, with the colormap as palette and a tRNS
+            chunk for transparency, instead of RGBA PNGs. Needs a colormap dict.
+        archive (str, optional): "mbtiles" or "pmtiles" writes the APNGs into a single archive
+            next to the output folder instead of one file per tile. They are written to an
+            MBTiles archive as they are assembled, which is converted at the end for PMTiles.
+        metatile (int): Read blocks of up to ``metatile`` x ``metatile`` neighbouring tiles
+            (a power of two, e.g. 4 or 8) as one window per frame and slice them into tiles
+            in memory, instead of reading and warping every tile on its own. 1 reads tiles
+            one by one.
+        budget (BudgetShare, optional): This layer's share of a worker budget shared with the
+            layers processed concurrently. Every rendering task waits for a slot of it.
+        progress (callable, optional): Called with (stage, completed, total) as the work
+            progresses, instead of showing a spinner. Used by the layer scheduler.
         """
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported mode: {mode}")
+        if tile_cover not in self.TILE_COVERS:
+            raise ValueError(f"Unsupported tile cover: {tile_cover}")
+        if pyramid_reducer not in PYRAMID_REDUCERS:
+            raise ValueError(f"Unsupported pyramid reducer: {pyramid_reducer}")
+        if archive is not None and archive not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format: {archive}")
+        if metatile < 1 or metatile & (metatile - 1):
+            raise ValueError(f"Metatile size must be a power of two: {metatile}")
+
         self.data = data
         self.output_folder = output_folder
         self.min_z = min_z
         self.max_z = max_z
-        self.zooms = list(np.arange(min_z, max_z + 1))
+        self.zooms = list(range(min_z, max_z + 1))
         self.color_map = color_map
         self.vmin = vmin
         self.vmax = vmax
         self.vector_file = vector_file
+        # The clip geometry in Web Mercator, when the engine clips to vector_file
+        self.clip_geometry = None
         self.date_format = date_format
+        self.mode = mode
+        self.pyramid = pyramid
+        self.pyramid_reducer = pyramid_reducer
+        self.metatile = metatile
+        self.tile_cover = tile_cover
+        self.force = force
+        self.delta_frames = delta_frames
+        # Colormap lookup table, plus one combined rescale + colormap table per integer dtype
+        self.lut = self._build_lut(color_map)
+        self._dtype_luts = {}
+        if palette and self.lut is None:
+            console.print(
+                "⚠️ palette output needs a colormap dict. Writing RGBA tiles.", style="bold yellow"
+            )
+        self.palette = palette and self.lut is not None
+        if self.palette:
+            self.palette_rgba, self.palette_index = self._build_palette(self.lut)
+        # Table applied to the rescaled values: colors, or palette indexes
+        self.color_table = self.palette_index if self.palette else self.lut
+        # Counters and stage timings of the run, see tile_stats
+        self.stats = TileStats()
+        # APNGs go to an MBTiles archive, also the staging store of PMTiles archives
+        self.archive = archive
+        self.store = MBTilesArchive(archive_path(output_folder, "mbtiles")) if archive else None
+        self.budget = budget
+        self.progress = progress
 
     def generate_tiles(self, time_coord=None):
         """
@@ -144,6 +391,938 @@ class TileEngine:
         """
         raise NotImplementedError("This method should be implemented by subclasses.")
 
+    def _read_tile(self, tile: mercantile.Tile, n: int) -> ImageData:
+        """
+        Read frame ``n`` of a tile.
+        """
+        raise NotImplementedError("This method should be implemented by subclasses.")
+
+    def _read_tiles(self, tiles: list, frames: list) -> list:
+        """
+        Read a group of frames (see ``_frame_reads``) of a block of neighbouring tiles of one
+        zoom level, see ``_read_block``. Each band of the images holds one frame.
+        """
+        raise NotImplementedError("This method should be implemented by subclasses.")
+
+    def _frame_reads(self, frames: list) -> list:
+        """
+        Split frames into the groups read together: one frame at a time.
+        """
+        return [[n] for n in frames]
+
+    @staticmethod
+    def _split_frames(img: Optional[ImageData], count: int) -> list:
+        """
+        Split the image of a group of ``count`` frames into one image per frame.
+        """
+        if img is None:
+            return [None] * count
+        if count == 1:
+            return [img]
+        return [ImageData(img.array[i : i + 1]) for i in range(count)]
+
+    @classmethod
+    def _read_block(cls, dst, tiles: list, **kwargs) -> list:
+        """
+        Read a block of neighbouring tiles of one zoom level as a single window, warped once,
+        and slice it into the tiles.
+
+        Args:
+            dst (rio_tiler.io.base.BaseReader): The open reader of the frame.
+            tiles (list of mercantile.Tile): The tiles, all of the same zoom level.
+            **kwargs: Options forwarded to ``dst.part``.
+
+        Returns:
+            list of ImageData or None: The image of every tile, None if it is outside the
+                bounds of the frame.
+        """
+        inside = [dst.tile_exists(tile.x, tile.y, tile.z) for tile in tiles]
+        if not any(inside):
+            return [None] * len(tiles)
+
+        z = tiles[0].z
+        x0, x1 = min(tile.x for tile in tiles), max(tile.x for tile in tiles)
+        y0, y1 = min(tile.y for tile in tiles), max(tile.y for tile in tiles)
+        top_left = dst.tms.xy_bounds(x0, y0, z)
+        bottom_right = dst.tms.xy_bounds(x1, y1, z)
+        block = dst.part(
+            (top_left.left, bottom_right.bottom, bottom_right.right, top_left.top),
+            dst_crs=dst.tms.rasterio_crs,
+            bounds_crs=dst.tms.rasterio_crs,
+            height=(y1 - y0 + 1) * cls.TILE_SIZE,
+            width=(x1 - x0 + 1) * cls.TILE_SIZE,
+            max_size=None,
+            **kwargs,
+        )
+
+        images = []
+        for tile, exists in zip(tiles, inside, strict=True):
+            if not exists:
+                images.append(None)
+                continue
+            row, col = (tile.y - y0) * cls.TILE_SIZE, (tile.x - x0) * cls.TILE_SIZE
+            window = block.array[:, row : row + cls.TILE_SIZE, col : col + cls.TILE_SIZE]
+            images.append(ImageData(window))
+        return images
+
+    @staticmethod
+    def _build_lut(color_map: Optional[ColorMapType]) -> Optional[np.ndarray]:
+        """
+        Build a 257x4 uint8 lookup table from a colormap dict.
+
+        Rows 0-255 hold the colors of the rescaled values, as rio-tiler applies them (values
+        missing from the colormap are transparent black). Row 256 is used for masked pixels:
+        the color of 0 with a transparent alpha.
+
+        Returns:
+            numpy.ndarray or None: The table, or None for interval colormaps and no colormap,
+                which are rendered by rio-tiler.
+        """
+        if not isinstance(color_map, dict) or not color_map:
+            return None
+
+        lut = np.zeros((257, 4), dtype=np.uint8)
+        for value, color in color_map.items():
+            if 0 <= value <= 255 and float(value).is_integer():
+                lut[int(value)] = color
+        lut[256, :3] = lut[0, :3]
+        return lut
+
+    @staticmethod
+    def _build_palette(lut: np.ndarray) -> tuple:
+        """
+        Build the PNG palette of a lookup table.
+
+        The 257 rows of the table (256 colors and the masked pixels) are reduced to their
+        unique colors. A palette holds 256 colors at most, so when all the rows differ the
+        two closest consecutive colors of the colormap are merged.
+
+        Returns:
+            tuple: The palette (Nx4 uint8 RGBA colors) and the palette index of every row of
+                the lookup table.
+        """
+        lut = lut.copy()
+        # The RGB of transparent pixels is not shown; share a single transparent color
+        lut[lut[:, 3] == 0] = 0
+        palette, index = np.unique(lut, axis=0, return_inverse=True)
+        if len(palette) > 256:
+            distance = (np.diff(lut[:256].astype(np.int32), axis=0) ** 2).sum(axis=1)
+            closest = int(np.argmin(distance))
+            lut[closest + 1] = lut[closest]
+            palette, index = np.unique(lut, axis=0, return_inverse=True)
+        return palette, index.reshape(-1).astype(np.uint8)
+
+    def _encode(self, pixels: np.ndarray) -> bytes:
+        """
+        Encode the output of the color table as PNG bytes: an RGBA image, or a palette image
+        with a tRNS chunk.
+        """
+        out = io.BytesIO()
+        if self.palette:
+            image = Image.fromarray(pixels, "P")
+            image.putpalette(self.palette_rgba[:, :3].tobytes())
+            image.save(out, "PNG", transparency=self.palette_rgba[:, 3].tobytes())
+        else:
+            Image.fromarray(pixels, "RGBA").save(out, "PNG")
+        return out.getvalue()
+
+    def _rescale_index(self, values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """
+        Rescale values from vmin-vmax to 0-255, with the same arithmetic and casts as
+        ``ImageData.rescale``, and send the masked pixels to the last row of the lookup table.
+        """
+        scaled = np.clip(values, self.vmin, self.vmax, dtype=np.float64) - self.vmin
+        scaled = scaled / np.float64(self.vmax - self.vmin) * 255
+        index = np.where(valid, scaled, 0).astype(values.dtype).astype(np.uint8)
+        return np.where(valid, index, np.uint16(256))
+
+    def _dtype_lut(self, dtype: np.dtype) -> Optional[np.ndarray]:
+        """
+        For 8 and 16 bit integer data, return a table mapping every raw value straight to its
+        color or palette index (the rescale and the colormap in one lookup), built once per
+        layer and dtype. Masked pixels use the last row.
+        """
+        if dtype.kind not in "iu" or dtype.itemsize > 2:
+            return None
+        if dtype not in self._dtype_luts:
+            info = np.iinfo(dtype)
+            values = np.arange(info.min, info.max + 1, dtype=dtype)
+            index = self._rescale_index(values, np.ones(values.shape, dtype=bool))
+            self._dtype_luts[dtype] = np.concatenate(
+                [self.color_table.take(index, axis=0), self.color_table[256:]]
+            )
+        return self._dtype_luts[dtype]
+
+    def _render(self, img: ImageData) -> bytes:
+        """
+        Rescale and colorize a single-band tile image with the lookup table and encode it as
+        PNG bytes, once.
+
+        Produces the same image as ``_render_rio_tiler``, which is still used for colormaps
+        without a lookup table. Palette output only differs in the (hidden) color of the
+        transparent pixels, and when two colors had to be merged, see ``_build_palette``.
+        """
+        if self.lut is None or img.count != 1:
+            return self._render_rio_tiler(img)
+
+        stats = self._stats()
+        with stats.time("render"):
+            values = img.array.data[0]
+            valid = ~np.ma.getmaskarray(img.array)[0]
+            table = self._dtype_lut(values.dtype)
+            if table is not None:
+                index = values.astype(np.intp) - np.iinfo(values.dtype).min
+                index[~valid] = len(table) - 1
+            else:
+                table = self.color_table
+                index = self._rescale_index(values, valid)
+            pixels = table.take(index, axis=0)
+
+        with stats.time("encode"):
+            return self._encode(pixels)
+
+    def _render_rio_tiler(self, img: ImageData) -> bytes:
+        """
+        Rescale and colorize a tile image with rio-tiler and encode it as PNG bytes.
+        """
+        stats = self._stats()
+        # rio-tiler encodes as it renders, so its encoding counts as rendering
+        with stats.time("render"):
+            # Rescale the data linearly from vmin-vmax to 0-255
+            img.rescale(in_range=((self.vmin, self.vmax),), out_range=((0, 255),))
+            # Apply colormap and create a PNG buffer
+            buff = img.render(colormap=self.color_map, add_mask=True)
+        with stats.time("encode"):
+            return self._reencode(buff)
+
+    @staticmethod
+    def _reencode(buff: bytes) -> bytes:
+        """
+        Re-encode a rendered PNG buffer with PIL, as the tiles have always been written.
+        """
+        image = Image.open(io.BytesIO(buff))
+        out = io.BytesIO()
+        image.save(out, "PNG")
+        return out.getvalue()
+
+    def _read_frame(self, tile: mercantile.Tile, n: int) -> Optional[ImageData]:
+        """
+        Read frame ``n`` of a tile.
+
+        Returns:
+            ImageData or None: The tile image, or None if the tile is outside the frame or failed.
+        """
+        stats = self._stats()
+        stats.count("attempted")
+        try:
+            with stats.time("read"):
+                return self._read_tile(tile, n)
+        except TileOutsideBounds:
+            stats.count("out_of_bounds")
+            return None
+        except Exception as e:
+            stats.count("failed")
+            print(f"An error occurred while generating tiles: {e}")
+            return None
+
+    def _read_metatile(self, tiles: list, frames: list) -> dict:
+        """
+        Read the given frames of a block of neighbouring tiles of one zoom level, one window
+        per frame.
+
+        Returns:
+            dict: The image (or None) of each frame of every tile, by tile.
+        """
+        stats = self._stats()
+        images = {tile: [] for tile in tiles}
+        for group in self._frame_reads(frames):
+            stats.count("attempted", len(tiles) * len(group))
+            try:
+                with stats.time("read"):
+                    block = self._read_tiles(tiles, group)
+            except Exception as e:
+                stats.count("failed", len(tiles) * len(group))
+                print(f"An error occurred while generating tiles: {e}")
+                block = [None] * len(tiles)
+            else:
+                stats.count("out_of_bounds", sum(img is None for img in block) * len(group))
+            for tile, img in zip(tiles, block, strict=True):
+                images[tile].extend(self._split_frames(img, len(group)))
+        return images
+
+    def _read_frames(self, tile: mercantile.Tile, frames: list) -> list:
+        """
+        Read the given frames of a tile, see ``_read_frame``.
+        """
+        return [self._read_frame(tile, n) for n in frames]
+
+    def _load_clip_geometry(self):
+        """
+        Load the union of the geometries of ``vector_file`` in Web Mercator, the CRS of the
+        tiles, so every tile can be clipped as it is rendered.
+        """
+        footprint = vector_footprint(self.vector_file)
+        # Web Mercator stops short of the poles
+        footprint = shapely.clip_by_rect(footprint, -180, -85.0511287798066, 180, 85.0511287798066)
+        self.clip_geometry = shapely.transform(
+            footprint,
+            lambda coords: np.column_stack(
+                transform("EPSG:4326", "EPSG:3857", coords[:, 0], coords[:, 1])
+            ),
+        )
+
+    def _clip_mask(self, tile: mercantile.Tile) -> Optional[np.ndarray]:
+        """
+        The pixels of a tile outside the clip geometry. A pixel is inside when its center is,
+        as with ``rasterio.mask``.
+
+        Returns:
+            numpy.ndarray or None: True for the pixels outside, or None if the whole tile is
+            inside.
+        """
+        bounds = mercantile.xy_bounds(tile)
+        shapely.prepare(self.clip_geometry)
+        if shapely.contains(self.clip_geometry, shapely.box(*bounds)):
+            return None
+
+        shape = (self.TILE_SIZE, self.TILE_SIZE)
+        # Only the part of the geometry over the tile is rasterized
+        part = shapely.clip_by_rect(self.clip_geometry, *bounds)
+        if part.is_empty:
+            return np.ones(shape, dtype=bool)
+        return geometry_mask([part], shape, from_bounds(*bounds, *shape))
+
+    def _clip(self, tile: mercantile.Tile, images: list) -> list:
+        """
+        Mask the pixels outside the clip geometry in the frames of a tile. The mask is
+        rasterized once per tile and shared by all its frames.
+        """
+        if self.clip_geometry is None:
+            return images
+        outside = self._clip_mask(tile)
+        if outside is None:
+            return images
+        for img in images:
+            if img is not None:
+                img.array[..., outside] = np.ma.masked
+        return images
+
+    def _stats(self) -> TileStats:
+        """
+        Where to record counters and timings: the recorder of the calling worker task, or the
+        run's stats outside of worker tasks.
+        """
+        return current() or self.stats
+
+    def _live(self):
+        """
+        The spinner showing what the engine is doing, or a stand-in that shows nothing when
+        the progress goes to ``self.progress``.
+        """
+        if self.progress is None:
+            return Live(console=console, refresh_per_second=10)
+        return _QuietLive()
+
+    def _report_progress(self, stage: str, completed: int, total: int):
+        if self.progress is not None:
+            self.progress(stage, completed, total)
+
+    def _map(self, executor, fn, items, max_pending: int):
+        """
+        ``executor.map`` over a bounded queue of at most ``max_pending`` tasks, fed lazily
+        from ``items``, with every task waiting for a slot of the worker budget if any.
+        """
+        return bounded_map(executor, fn, items, max_pending, self.budget)
+
+    def _budgeted(self, fn: Callable) -> Callable:
+        """
+        ``fn``, holding a slot of the worker budget while it runs if there is one.
+        """
+        if self.budget is None:
+            return fn
+
+        @wraps(fn)
+        def run(*args, **kwargs):
+            with self.budget.slot():
+                return fn(*args, **kwargs)
+
+        return run
+
+    @staticmethod
+    def _is_empty(img: Optional[ImageData]) -> bool:
+        """
+        Whether a tile image is missing or fully masked.
+        """
+        return img is None or np.ma.getmaskarray(img.array).all()
+
+    def _render_blank(self, num_bands: int = 1) -> bytes:
+        """
+        Render a fully masked tile. Used for the frames of a tile that have no data.
+        """
+        shape = (num_bands, self.TILE_SIZE, self.TILE_SIZE)
+        dtype = "float32" if num_bands == 1 else "uint8"
+        return self._render(ImageData(np.ma.masked_array(np.zeros(shape, dtype), mask=True)))
+
+    def _set_tiles(self, bbox: list, footprint=None):
+        """
+        Set the tiles to generate at every zoom level.
+
+        Without a footprint every tile of the bounding box is generated. Otherwise only the
+        tiles intersecting the footprint are kept, descending from the tiles kept at the zoom
+        level above, so the cover is computed once and reused for all frames.
+
+        Args:
+            bbox (list): The bounding box of the data in EPSG:4326.
+            footprint (shapely.Geometry, optional): The data footprint in EPSG:4326.
+        """
+        self.bounds = bbox
+        if footprint is not None:
+            footprint = footprint.intersection(shapely.box(*bbox))
+        if footprint is None or footprint.is_empty:
+            self.tiles = list(mercantile.tiles(*bbox, zooms=self.zooms))
+            self.tile_set = set(self.tiles)
+            return
+
+        shapely.prepare(footprint)
+        tiles = []
+        level = list(mercantile.tiles(*bbox, zooms=self.min_z))
+        for z in self.zooms:
+            if z > self.min_z:
+                level = [child for tile in level for child in mercantile.children(tile)]
+            boxes = shapely.box(*np.array([mercantile.bounds(tile) for tile in level]).T)
+            # Tiles that only touch the footprint have no data
+            keep = shapely.intersects(footprint, boxes) & ~shapely.touches(footprint, boxes)
+            level = sorted(tile for tile, k in zip(level, keep, strict=True) if k)
+            tiles.extend(level)
+
+        console.print(
+            f"🗺️ Tile cover: {len(tiles)} tiles intersect the data footprint", style="bold blue"
+        )
+        self.tiles = tiles
+        self.tile_set = set(tiles)
+
+    def _tile_dir(self, tile: mercantile.Tile) -> str:
+        tile_dir = os.path.join(self.output_folder, str(tile.z), str(tile.x))
+        os.makedirs(tile_dir, exist_ok=True)
+        return tile_dir
+
+    def _save_tile(self, tile: mercantile.Tile, frames: list, images: list):
+        """
+        Render the frames of a tile and save them.
+
+        In frame-major mode each frame is saved as ``{z}/{x}/{y}_{NNN}.png``; in tile-major mode
+        all frames are saved together as the ``{z}/{x}/{y}.png`` APNG.
+
+        Args:
+            tile (mercantile.Tile): A mercantile tile object.
+            frames (list of int): The frame indexes.
+            images (list of ImageData or None): The tile image of each frame.
+        """
+        # Fully masked frames are never encoded, they all render to the same blank frame
+        pngs = [None if self._is_empty(img) else self._render(img) for img in images]
+        stats = self._stats()
+        stats.count("rendered", sum(png is not None for png in pngs))
+        stats.count(
+            "empty",
+            sum(img is not None and png is None for img, png in zip(images, pngs, strict=True)),
+        )
+
+        if self.mode == "tile_major":
+            # Tiles without data in any frame are never written
+            if all(png is None for png in pngs):
+                return
+
+            with stats.time("assemble"):
+                animation = build_apng([png or self.blank_png for png in pngs], self.delta_frames)
+            with stats.time("write"):
+                if self.store is not None:
+                    self.store.put_tile(tile, animation)
+                else:
+                    Path(self._tile_dir(tile), f"{tile.y}.png").write_bytes(animation)
+            stats.count("written")
+            return
+
+        # Frames without data are left out and filled in with the blank frame by create_apngs
+        for n, png in zip(frames, pngs, strict=True):
+            if png is None:
+                continue
+
+            number = "{:03d}".format(n)
+            with stats.time("write"):
+                tile_file = os.path.join(self._tile_dir(tile), f"{tile.y}_{number}.png")
+                with open(tile_file, "wb") as f:
+                    f.write(png)
+
+    def _create_tile(self, tile: mercantile.Tile, frames: list):
+        """
+        Read, render and save the given frames of a tile.
+        """
+        self._save_tile(tile, frames, self._clip(tile, self._read_frames(tile, frames)))
+
+    def _create_tiles(self, tiles: list, frames: list) -> TileStats:
+        """
+        Create the given frames of a list of tiles, as a worker task. In metatile mode the
+        tiles are read one metatile at a time.
+
+        Returns:
+            TileStats: The counters and timings of the task.
+        """
+        with recording(TileStats()) as stats:
+            if self.metatile > 1:
+                for metatile in self._metatiles(tiles):
+                    images = self._read_metatile(metatile, frames)
+                    for tile in metatile:
+                        self._save_tile(tile, frames, self._clip(tile, images[tile]))
+            else:
+                for tile in tiles:
+                    self._create_tile(tile, frames)
+        return stats
+
+    def _metatile_key(self, tile: mercantile.Tile) -> tuple:
+        return tile.z, tile.x // self.metatile, tile.y // self.metatile
+
+    def _metatiles(self, tiles: list) -> Iterator[list]:
+        """
+        Split tiles into blocks of up to ``metatile`` x ``metatile`` tiles, lazily.
+        """
+        key = self._metatile_key
+        return (list(block) for _, block in groupby(sorted(tiles, key=key), key=key))
+
+    def _work_units(self, tiles: list) -> Iterator[list]:
+        """
+        Split tiles into the chunks given to the workers: one per metatile in metatile
+        mode, one per z/x column otherwise.
+        """
+        if self.metatile > 1:
+            return self._metatiles(tiles)
+        return self._tile_columns(tiles)
+
+    def _frame_groups(self, num_frames: int) -> list:
+        """
+        Return the frame indexes still to render together: every frame at once in tile-major
+        mode, one frame at a time otherwise.
+        """
+        if self.manifest.complete:
+            return []
+        if self.mode == "tile_major":
+            return [list(range(num_frames))]
+        return [[n] for n in self.manifest.pending_frames()]
+
+    def _pending_tiles(self) -> list:
+        """
+        Return the tiles still to render. Pyramid mode always renders every tile, as parents
+        are built from their children.
+        """
+        if self.mode == "tile_major" and not self.pyramid:
+            return self.manifest.pending_tiles(self.tiles)
+        return self.tiles
+
+    def _render_params(self) -> dict:
+        """
+        The parameters that change the rendered tiles, recorded in the manifest.
+        """
+        return {
+            "color_map": self.color_map,
+            "vmin": self.vmin,
+            "vmax": self.vmax,
+            "zooms": [self.min_z, self.max_z],
+            "mode": self.mode,
+            "pyramid": self.pyramid and self.pyramid_reducer,
+            "tile_cover": self.tile_cover,
+            "delta_frames": self.delta_frames,
+            "palette": self.palette,
+            "vector_file": self.vector_file and file_signature(self.vector_file),
+            "archive": self.archive,
+        }
+
+    def _open_manifest(self, sources: list):
+        """
+        Open the manifest of the output folder and forget the work that is stale.
+
+        Args:
+            sources (list): Signature of every source frame, in frame order.
+        """
+        params = self._render_params()
+        self.manifest = TileManifest(self.output_folder)
+        output = self._output_path(self.manifest.complete)
+        forgotten = self.manifest.begin(
+            params_key(params), sources, force=self.force, output=output
+        )
+        if forgotten:
+            if self.store is not None:
+                self.store.clear()
+            self._remove_stale_files(self.manifest.pending_frames())
+        self.up_to_date = self.manifest.complete
+        if self.up_to_date:
+            console.print(f"⏭️ Tiles in {output} are up to date, nothing to do", style="bold blue")
+
+    def _remove_stale_files(self, frames: list):
+        """
+        Remove the files of the output folder that the forgotten work left behind: the frame
+        files of the frames to render again and, without an archive, every APNG. Tiles without
+        data are never written, so their old APNG would otherwise still be served.
+
+        Args:
+            frames (list of int): The frames to render again.
+        """
+        frames = set(frames)
+        removed = 0
+        for z_dir in os.scandir(self.output_folder) if os.path.isdir(self.output_folder) else []:
+            if not (z_dir.is_dir() and z_dir.name.isdigit()):
+                continue
+            for x_dir in os.scandir(z_dir.path):
+                if not x_dir.is_dir():
+                    continue
+                for entry in os.scandir(x_dir.path):
+                    stem, ext = os.path.splitext(entry.name)
+                    if ext != ".png":
+                        continue
+                    # {y}.png APNGs and {y}_{NNN}.png frames
+                    _, _, number = stem.partition("_")
+                    if number.isdigit():
+                        stale = int(number) in frames
+                    else:
+                        stale = not number and self.store is None
+                    if stale:
+                        os.remove(entry.path)
+                        removed += 1
+        if removed:
+            console.print(f"🧹 Removed {removed} stale tile files", style="bold blue")
+
+    def _output_path(self, complete: bool) -> Path:
+        """
+        Where the work of a complete or unfinished run is stored.
+
+        Frame-major runs stage their frames in the output folder even when writing an archive;
+        the APNGs go to the MBTiles store until the archive is finished.
+        """
+        if self.store is None:
+            return Path(self.output_folder)
+        if complete:
+            return archive_path(self.output_folder, self.archive)
+        if self.mode == "frame_major":
+            return Path(self.output_folder)
+        return self.store.path
+
+    def finish_archive(self):
+        """
+        Write the archive metadata, convert the MBTiles store for PMTiles archives and remove
+        the folders left empty by the frames.
+        """
+        metadata = {
+            "name": Path(self.output_folder).name,
+            "format": "png",
+            "type": "overlay",
+            "bounds": self.bounds,
+            "minzoom": self.min_z,
+            "maxzoom": self.max_z,
+            "frames": self.num_frames,
+        }
+        stats = self.store.finish(metadata)
+        path = archive_path(self.output_folder, self.archive)
+        if self.archive == "pmtiles":
+            write_pmtiles(self.store, path, metadata)
+            self.store.close()
+            self.store.path.unlink()
+
+        for root, _, _ in os.walk(self.output_folder, topdown=False):
+            if not os.listdir(root):
+                os.rmdir(root)
+
+        console.print(
+            f"🧮 {stats['tiles']} tiles written, {len(self.tiles) - stats['tiles']} empty tiles "
+            f"skipped, {stats['tiles'] - stats['unique']} duplicates "
+            f"({stats['bytes_saved'] / 1e6:.1f} MB) stored once",
+            style="bold blue",
+        )
+        console.print(f"📦 Archive: {path} ({path.stat().st_size / 1e6:.1f} MB)", style="bold blue")
+
+    def _create_pyramid(
+        self, tile: mercantile.Tile, frames: list, metatile: Optional[dict] = None
+    ) -> list:
+        """
+        Render a tile and all its descendants down to ``max_z``.
+
+        Tiles at ``max_z`` are read from the source; every other tile is built by downsampling
+        the raw (pre-colormap) values of its four children. In metatile mode the ``max_z``
+        descendants of a tile up to ``metatile`` tiles wide are read as one block.
+
+        Args:
+            metatile (dict, optional): The images of the ``max_z`` tiles read as a block, see
+                ``_read_metatile``.
+
+        Returns:
+            list of numpy.ma.MaskedArray or None: The raw values of each frame of the tile.
+        """
+        if tile.z == self.max_z:
+            if metatile is not None:
+                images = metatile[tile]
+            else:
+                images = self._read_frames(tile, frames)
+            # Clipped before the parents are built from the raw values
+            images = self._clip(tile, images)
+            # Keep a copy of the raw values, rendering rescales the images in place
+            arrays = [None if img is None else img.array.copy() for img in images]
+            self._save_tile(tile, frames, images)
+            return arrays
+
+        if metatile is None and self.metatile > 1 and 2 ** (self.max_z - tile.z) <= self.metatile:
+            block = [
+                child
+                for child in mercantile.children(tile, zoom=self.max_z)
+                if child in self.tile_set
+            ]
+            metatile = self._read_metatile(block, frames) if block else None
+
+        children = [
+            self._create_pyramid(child, frames, metatile) if child in self.tile_set else None
+            for child in mercantile.children(tile)
+        ]
+        return self._create_parent(tile, frames, children)
+
+    def _create_pyramid_root(self, tile: mercantile.Tile, frames: list) -> tuple:
+        """
+        Render a pyramid subtree, see ``_create_pyramid``, as a worker task.
+
+        Returns:
+            tuple: The raw values of each frame of the tile, and the counters and timings of
+                the task.
+        """
+        with recording(TileStats()) as stats:
+            return self._create_pyramid(tile, frames), stats
+
+    def _create_parent(self, tile: mercantile.Tile, frames: list, children: list) -> list:
+        """
+        Build, render and save a tile from the raw values of its four children.
+
+        Args:
+            tile (mercantile.Tile): A mercantile tile object.
+            frames (list of int): The frame indexes.
+            children (list): The raw frame arrays of each child, in ``mercantile.children``
+                order, or None for children without data.
+
+        Returns:
+            list of numpy.ma.MaskedArray or None: The raw values of each frame of the tile.
+        """
+        children = [child or [None] * len(frames) for child in children]
+        with self._stats().time("downsample"):
+            arrays = [
+                self._downsample([child[i] for child in children]) for i in range(len(frames))
+            ]
+        self._save_tile(
+            tile, frames, [None if array is None else ImageData(array.copy()) for array in arrays]
+        )
+        return arrays
+
+    def _create_pyramid_parents(self, roots: list, results: Iterable, frames: list):
+        """
+        Build the zoom levels between ``min_z`` and the pyramid roots as the results of the
+        subtree tasks come in, and add up their stats.
+
+        A tile is built as soon as all its children are in, and their raw values are dropped
+        then, so only the children of the tiles still incomplete are kept in memory.
+
+        Args:
+            roots (list): The pyramid root tiles, all of one zoom level.
+            results (iterable): The result of ``_create_pyramid_root`` for each root, in order.
+            frames (list of int): The frame indexes.
+        """
+        if not roots:
+            return
+
+        # The number of children of every tile above the roots, and the values of those in
+        root_z = roots[0].z
+        expected = {
+            tile: sum(child in self.tile_set for child in mercantile.children(tile))
+            for tile in self.tiles
+            if tile.z < root_z
+        }
+        arrived = defaultdict(dict)
+
+        def arrive(tile: mercantile.Tile, arrays: Optional[list]):
+            # Build the ancestors completed by this tile, bottom up
+            while tile.z > self.min_z:
+                parent = mercantile.parent(tile)
+                if parent not in expected:
+                    return
+                children = arrived[parent]
+                children[tile] = arrays
+                if len(children) < expected[parent]:
+                    return
+                del arrived[parent]
+                arrays = self._create_parent(
+                    parent, frames, [children.get(child) for child in mercantile.children(parent)]
+                )
+                tile = parent
+
+        # Tiles above the roots without children in the cover have no data
+        for tile in sorted((t for t, n in expected.items() if n == 0), key=lambda t: -t.z):
+            arrive(tile, None)
+        for root, (arrays, stats) in zip(roots, results, strict=True):
+            self.stats.merge(stats)
+            arrive(root, arrays)
+
+    def _pyramid_roots(self, workers: int) -> list:
+        """
+        Return the tiles whose subtrees are rendered in parallel in pyramid mode.
+
+        That is the tiles of the lowest zoom level with enough tiles to keep every worker busy.
+        """
+        for z in self.zooms:
+            level = [tile for tile in self.tiles if tile.z == z]
+            if len(level) >= 4 * workers:
+                return level
+        return [tile for tile in self.tiles if tile.z == self.max_z]
+
+    def _downsample(self, arrays: list) -> Optional[np.ma.MaskedArray]:
+        """
+        Downsample the raw values of four children into their parent tile.
+
+        Args:
+            arrays (list): The children's masked arrays, in ``mercantile.children`` order,
+                or None for missing children.
+
+        Returns:
+            numpy.ma.MaskedArray or None: The parent's values, or None if no child has data.
+        """
+        present = [array for array in arrays if array is not None]
+        if not present:
+            return None
+
+        bands, size, _ = present[0].shape
+        dtype = present[0].dtype
+        mosaic = np.ma.masked_all((bands, 2 * size, 2 * size), dtype=dtype)
+        # mercantile.children order: top-left, top-right, bottom-right, bottom-left
+        for array, (row, col) in zip(arrays, ((0, 0), (0, 1), (1, 1), (1, 0)), strict=True):
+            if array is not None:
+                mosaic[:, row * size : (row + 1) * size, col * size : (col + 1) * size] = array
+
+        reduced = PYRAMID_REDUCERS[self.pyramid_reducer](mosaic.reshape(bands, size, 2, size, 2))
+        if bands > 1:
+            # Multi-band tiles are rendered as they are, so keep their data type
+            reduced = reduced.round().astype(dtype)
+        return reduced
+
+    @staticmethod
+    def _tile_columns(tiles: list) -> Iterator[list]:
+        """
+        Split tiles into one chunk per z/x column, lazily.
+        """
+        return (list(column) for _, column in groupby(tiles, key=lambda t: (t.z, t.x)))
+
+
+class _ReaderCache:
+    """
+    Per-thread LRU cache of open rio-tiler readers.
+
+    Each worker thread keeps its own readers, so a frame's GeoTIFF is opened once per worker
+    instead of once per tile. All readers are closed together by ``close``.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        """
+        Initialize the reader cache.
+
+        Args:
+            maxsize (int): Maximum number of open readers per thread. 0 disables caching.
+        """
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._caches = []
+
+    def _thread_cache(self) -> OrderedDict:
+        cache = getattr(self._local, "readers", None)
+        if cache is None:
+            # Keep a GDAL environment alive for the thread's lifetime. Datasets opened inside
+            # it don't own a thread-local environment, so ``close`` can run from any thread.
+            # The environment is thread-local and can only be exited by its own thread, so
+            # it is entered once per thread and reused by every later cache on that thread.
+            if not rasterio.env.hasenv():
+                rasterio.Env().__enter__()
+            cache = OrderedDict()
+            self._local.readers = cache
+            with self._lock:
+                self._caches.append(cache)
+        return cache
+
+    @contextmanager
+    def open(self, path: str):
+        """
+        Yield an open reader for ``path``, reusing the calling thread's reader if possible.
+        """
+        if self.maxsize <= 0:
+            with Reader(path) as dst:
+                yield dst
+            return
+
+        cache = self._thread_cache()
+        reader = cache.pop(path, None)
+        if reader is None:
+            reader = Reader(path)
+        cache[path] = reader
+
+        # Evict the least recently used readers
+        while len(cache) > self.maxsize:
+            _, evicted = cache.popitem(last=False)
+            evicted.close()
+
+        yield reader
+
+    def close(self):
+        """
+        Close every reader opened by any thread.
+        """
+        with self._lock:
+            for cache in self._caches:
+                for reader in cache.values():
+                    reader.close()
+                cache.clear()
+            self._caches = []
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Open readers, locks and thread-locals stay in the process that created them
+        return {"maxsize": self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state["maxsize"])
+
+
+# Engine used by the tasks of a process-pool worker
+_process_engine = None
+
+
+class _QuietLive:
+    """
+    Stand-in for ``rich.live.Live`` that shows nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def update(self, renderable):
+        pass
+
+
+def _init_process_worker(engine: "TileEngine"):
+    """
+    Store the engine in a process-pool worker so tasks only need to send their tiles.
+    """
+    global _process_engine
+    _process_engine = engine
+
+
+def _process_create_tiles(tiles: list, frames: list) -> TileStats:
+    return _process_engine._create_tiles(tiles, frames)
+
+
+def _process_create_pyramid(tile: mercantile.Tile, frames: list) -> tuple:
+    return _process_engine._create_pyramid_root(tile, frames)
+
 
 # Define a class for the rasterio engine
 class RasterioEngine(TileEngine):
@@ -151,158 +1330,314 @@ class RasterioEngine(TileEngine):
     Represents a rasterio tiler.
     """
 
-    def __init__(self, *args, **kwargs):
+    EXECUTORS = ("thread", "process")
+
+    def __init__(
+        self,
+        *args,
+        reader_cache_size: int = 8,
+        executor: str = "thread",
+        max_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        prepare_cogs: bool = False,
+        cog_cache_dir: Optional[Path] = None,
+        overview_resampling: str = "nearest",
+        frame_cube: bool = False,
+        cube_dir: Optional[Path] = None,
+        **kwargs,
+    ):
         """
         Initialize the RasterioEngine class.
+
+        Args:
+            reader_cache_size (int): Maximum number of open GeoTIFF readers kept per worker
+                thread. Set to 0 to open the file for every tile.
+            executor (str): "thread" renders tiles in a thread pool; "process" uses a process
+                pool, which avoids the GIL-bound rescale, colormap and PNG encoding steps.
+            max_workers (int, optional): Number of workers. Defaults to the executor's default.
+            queue_size (int, optional): Most tile columns (or pyramid subtrees) queued or
+                being rendered at once. Defaults to 4 per worker.
+            prepare_cogs (bool): Convert the frames to tiled COGs with overviews before tiling,
+                so low zoom tiles are read from an overview instead of the full resolution.
+                Useful for striped GeoTIFFs without overviews.
+            cog_cache_dir (Path, optional): Where the COGs are kept between runs, keyed on the
+                content of their frame. Defaults to ``{input_folder}_cogs`` next to the input.
+            overview_resampling (str): Resampling method of the COG or frame cube overviews,
+                e.g. "nearest" for categorical layers or "average" for continuous ones.
+            frame_cube (bool): In tile-major mode, pack the frames into a single tiled,
+                pixel-interleaved multi-band GeoTIFF with overviews before tiling, so all the
+                frames of a tile come from one read instead of one read per frame file. Needs
+                single-band frames on the same grid. Replaces ``prepare_cogs``.
+            cube_dir (Path, optional): Where the cube is kept between runs, keyed on the
+                frame files. Defaults to ``{input_folder}_cube`` next to the input.
         """
         super().__init__(*args, **kwargs)
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"Unsupported executor: {executor}")
+
+        self.reader_cache = _ReaderCache(reader_cache_size)
+        self.executor = executor
+        self.max_workers = max_workers
+        self.queue_size = queue_size
         if not (isinstance(self.data, str) and os.path.isdir(self.data)):
             raise ValueError(
                 "For engine 'rasterio', 'data' must be a valid directory or file path."
             )
 
-        # Track the clipped folder for cleanup
-        self.clipped_folder_path = None
+        self.prepare_cogs = prepare_cogs
+        source_folder = Path(self.data)
+        self.cog_cache_dir = Path(
+            cog_cache_dir or source_folder.parent / f"{source_folder.name}_cogs"
+        )
+        self.overview_resampling = overview_resampling
+
+        # All frames of a tile are only read together in tile-major mode
+        if frame_cube and self.mode != "tile_major":
+            console.print(
+                "⚠️ frame_cube only applies to tile_major mode. Reading the frame files.",
+                style="bold yellow",
+            )
+        self.frame_cube = frame_cube and self.mode == "tile_major"
+        self.cube_dir = Path(cube_dir or source_folder.parent / f"{source_folder.name}_cube")
+        self.cube_path = None
 
-        # Handle clipping if vector_file is provided
+        # Clip the tiles as they are rendered, no clipped copy of the frames is written
         if self.vector_file:
-            self._perform_clipping()
+            self._load_clip_geometry()
 
-    def _perform_clipping(self):
+    def _render_params(self) -> dict:
         """
-        Clip all rasters in the data folder using the provided vector file.
+        The parameters that change the rendered tiles, including the COG or cube overviews.
         """
-        console.print("✂️ Clipping rasters with vector file...", style="bold blue")
+        params = super()._render_params()
+        params["prepare_cogs"] = self.prepare_cogs and self.overview_resampling
+        params["frame_cube"] = self.frame_cube and self.overview_resampling
+        return params
 
-        # Create a new folder for clipped rasters
-        input_folder = Path(self.data)
-        clipped_folder = input_folder.parent / f"{input_folder.name}_clipped"
-
-        # Store the clipped folder path for cleanup
-        self.clipped_folder_path = clipped_folder
+    def _prepare_frames(self):
+        """
+        Pack the frames into a frame cube, or convert them to COGs, if asked to and there is
+        work left.
+        """
+        if self.up_to_date:
+            return
+        if self.frame_cube:
+            self._prepare_frame_cube()
+        elif self.prepare_cogs:
+            self._prepare_cogs()
 
-        # Perform clipping
-        clipped_path = clip_rasters_by_vector(
-            input_folder=input_folder, vector_file=self.vector_file, output_folder=clipped_folder
+    def _prepare_frame_cube(self):
+        """
+        Read the frames from a frame cube, building it unless it is in the cache. Frames
+        that cannot be packed together are read from their files.
+        """
+        console.print(
+            f"🧊 Packing {len(self.tif_file_paths)} frames into a frame cube in {self.cube_dir}...",
+            style="bold blue",
         )
+        try:
+            self.cube_path = str(
+                cached_frame_cube(self.tif_file_paths, self.cube_dir, self.overview_resampling)
+            )
+        except ValueError as e:
+            console.print(f"⚠️ {e}. Reading the frame files.", style="bold yellow")
 
-        # Update the data path to use clipped rasters
-        self.data = str(clipped_path)
-
-    def _cleanup_clipped_rasters(self):
+    def _prepare_cogs(self):
         """
-        Remove the temporary clipped rasters folder.
+        Read the frames from COGs with overviews, converting the frames not in the cache.
         """
-        if self.clipped_folder_path and self.clipped_folder_path.exists():
-            shutil.rmtree(self.clipped_folder_path)
-            console.print(
-                f"🧹 Cleaned up temporary clipped rasters: {self.clipped_folder_path}",
-                style="bold blue",
-            )
+        console.print(
+            f"🗜️ Preparing COGs for {len(self.tif_file_paths)} frames in {self.cog_cache_dir}...",
+            style="bold blue",
+        )
+        cog_paths = prepare_cogs(
+            self.tif_file_paths,
+            self.cog_cache_dir,
+            overview_resampling=self.overview_resampling,
+            max_workers=self.max_workers,
+        )
+        self.tif_file_paths = [str(path) for path in cog_paths]
 
-    def _create_tile(
-        self,
-        tile: mercantile.Tile = None,
-        tif_file_path: str = None,
-        n: int = 0,
-        num_bands: int = 4,
-        indexes: Optional[Tuple[int, ...]] = (1, 2, 3, 4),
-        colormap: Optional[ColorMapType] = None,
-    ):
+    def _read_tile(self, tile: mercantile.Tile, n: int) -> ImageData:
         """
-        Generate a PNG tile from a GeoTIFF file using rio-tiler.
+        Read frame ``n`` of a tile from its GeoTIFF file using rio-tiler.
 
         Args:
             tile (mercantile.Tile): A mercantile tile object.
-            tif_file_path (str): The file path to the GeoTIFF file.
             n (int): The index of the GeoTIFF file in the list of files.
-            num_bands (int): The number of bands in the GeoTIFF file.
-            indexes (int or sequence of int, optional): Band indexes.
-            colormap (dict or sequence, optional): RGBA Color Table dictionary or sequence.
-            vmin (float): The minimum value for rescaling the data.
-            vmax (float): The maximum value for rescaling the data.
         """
-        try:
-            with Reader(tif_file_path) as dst:
-                # Get the tile data and mask
-                img = dst.tile(tile.x, tile.y, tile.z, indexes=indexes, tilesize=self.TILE_SIZE)
-                # Convert the data to an image
-                if num_bands == 1:
-                    # Rescale the data linearly from vmin-vmax to 0-255
-                    img.rescale(in_range=((self.vmin, self.vmax),), out_range=((0, 255),))
-                    # Apply colormap and create a PNG buffer
-                    buff = img.render(colormap=colormap, add_mask=True)
-                else:
-                    buff = img.render(add_mask=True)
+        with self.reader_cache.open(self.tif_file_paths[n]) as dst:
+            # Get the tile data and mask
+            return dst.tile(tile.x, tile.y, tile.z, indexes=self.indexes, tilesize=self.TILE_SIZE)
+
+    def _frame_reads(self, frames: list) -> list:
+        """
+        Split frames into the groups read together: all at once from a frame cube, one at a
+        time otherwise.
+        """
+        if self.cube_path is not None:
+            return [frames]
+        return super()._frame_reads(frames)
+
+    def _read_tiles(self, tiles: list, frames: list) -> list:
+        """
+        Read a group of frames of a block of neighbouring tiles as one window, from the frame
+        cube or from the GeoTIFF file of the frame.
+        """
+        if self.cube_path is not None:
+            with self.reader_cache.open(self.cube_path) as dst:
+                return self._read_block(dst, tiles, indexes=[n + 1 for n in frames])
+        with self.reader_cache.open(self.tif_file_paths[frames[0]]) as dst:
+            return self._read_block(dst, tiles, indexes=self.indexes)
 
-                # Open the image from the buffer
-                image = Image.open(io.BytesIO(buff))
+    def _read_frames(self, tile: mercantile.Tile, frames: list) -> list:
+        """
+        Read the given frames of a tile, in a single read from the frame cube if there is one.
+        """
+        if self.cube_path is None:
+            return super()._read_frames(tile, frames)
 
-                # Save the image as a PNG
-                number = "{:03d}".format(n)
-                tile_dir = os.path.join(self.output_folder, str(tile.z), str(tile.x))
-                tile_file = os.path.join(tile_dir, f"{tile.y}_{number}.png")
-                os.makedirs(tile_dir, exist_ok=True)
-                image.save(tile_file, "PNG")
+        stats = self._stats()
+        stats.count("attempted", len(frames))
+        try:
+            with stats.time("read"), self.reader_cache.open(self.cube_path) as dst:
+                img = dst.tile(
+                    tile.x,
+                    tile.y,
+                    tile.z,
+                    indexes=[n + 1 for n in frames],
+                    tilesize=self.TILE_SIZE,
+                )
         except TileOutsideBounds:
-            pass
+            stats.count("out_of_bounds", len(frames))
+            return [None] * len(frames)
         except Exception as e:
+            stats.count("failed", len(frames))
             print(f"An error occurred while generating tiles: {e}")
+            return [None] * len(frames)
+        return self._split_frames(img, len(frames))
 
-    def _create_tile_wrapper(self, tile):
-        self._create_tile(
-            tile,
-            tif_file_path=self.tif_file_path,
-            n=self.n,
-            num_bands=self.num_bands,
-            indexes=self.indexes,
-            colormap=self.color_map,
-        )
+    def _render(self, img: ImageData) -> bytes:
+        """
+        Rescale and colorize single-band tiles; render multi-band tiles as they are.
+        """
+        if self.num_bands == 1:
+            return super()._render(img)
+        return self._reencode(img.render(add_mask=True))
+
+    def _load_frames(self) -> list:
+        """
+        List the frames from the catalog next to the input folder, which only reads the
+        frames added or modified since the last run, and set the tiles covering all of them.
+
+        Returns:
+            list of FrameInfo: The frames, sorted by date.
+        """
+        catalog = FrameCatalog(self.data)
+        try:
+            frames = catalog.refresh(self.date_format)
+            if not frames:
+                raise ValueError(f"No dated frames found in {self.data}")
+            self.tif_file_paths = [os.path.join(self.data, info.name) for info in frames]
+            self.num_bands = frames[0].count
+
+            # The union of the frames, which may not share an extent
+            bbox = list(catalog.bounds(frames))
+            footprint = None
+            if self.vector_file:
+                # Nothing outside the clip geometry is rendered, whatever the tile cover
+                clip = vector_footprint(self.vector_file)
+                bbox = list(shapely.box(*bbox).intersection(shapely.box(*clip.bounds)).bounds)
+                if self.tile_cover == "footprint":
+                    footprint = clip
+            elif self.tile_cover == "footprint":
+                footprint = catalog.footprint(frames)
+        finally:
+            catalog.close()
+        self._set_tiles(bbox, footprint)
+        return frames
 
     def generate_tiles(self):
         """
         Generate tiles from a GeoTIFF files.
         """
-        # Use sophisticated date extraction logic from get_files_with_years
-        sorted_files = get_files_with_years(self.data, date_format=self.date_format)
-
-        with Live(console=console, refresh_per_second=10) as live:
-            for self.n, sorted_file in enumerate(sorted_files):
-                # Update spinner with current tile info
-                live.update(
-                    Spinner(
-                        "dots",
-                        text=f"Generating tiles for frame {self.n + 1}/\
-                            {len(sorted_files)}: {sorted_file[0]}",
-                    )
-                )
+        frame_infos = self._load_frames()
 
-                # Get the GeoTIFF file
-                tif_file = sorted_file[0]
-                self.tif_file_path = os.path.join(self.data, tif_file)
+        # Set the indexes parameter based on the number of bands
+        self.indexes = (1, 2, 3, 4) if self.num_bands == 4 else None
 
-                if self.n == 0:
-                    # Open the GeoTIFF file
-                    with open_raster_in_4326(self.tif_file_path) as src:
-                        # Get the bounding box
-                        bbox = list(src.bounds)
-                        # Get the count of bands
-                        self.num_bands = src.count
+        self.num_frames = len(frame_infos)
+        self.blank_png = self._render_blank(self.num_bands)
 
-                    # Calculate the tiles within the bounding box at the given zoom level
-                    tiles = list(
-                        mercantile.tiles(bbox[0], bbox[1], bbox[2], bbox[3], zooms=self.zooms)
-                    )
+        # Skip the work recorded by a previous run of the same sources and parameters
+        sources = [json.dumps([info.name, info.hash]) for info in frame_infos]
+        self._open_manifest(sources)
+        # After the tile cover, which is computed from the full resolution frames
+        self._prepare_frames()
 
-                    # Set the indexes parameter based on the number of bands
-                    self.indexes = (1, 2, 3, 4) if self.num_bands == 4 else None
+        # Workers get one z/x column of tiles (or metatile), or one pyramid subtree, at a time
+        # and are fed from a bounded queue, so memory stays flat whatever the number of tiles
+        pending = self._pending_tiles()
+        # Under a worker budget the pool can grow to the whole budget, which caps the tasks
+        # running at once over every layer
+        workers = self.max_workers or (self.budget.workers if self.budget else None)
+        max_pending = self.queue_size or 4 * (workers or os.cpu_count())
+        roots = self._pyramid_roots(workers or os.cpu_count()) if self.pyramid else []
+        frame_groups = self._frame_groups(len(frame_infos))
+        num_columns = sum(1 for _ in self._work_units(pending))
+        total = len(frame_groups) * (len(roots) if self.pyramid else num_columns)
+        completed = 0
+        if self.executor == "process":
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self,),
+            )
+            create_tiles = _process_create_tiles
+            create_pyramid = _process_create_pyramid
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+            create_tiles = self._create_tiles
+            create_pyramid = self._create_pyramid_root
 
-                # Using ThreadPoolExecutor to parallelize the process
-                with ThreadPoolExecutor() as executor:
-                    executor.map(self._create_tile_wrapper, tiles)
+        try:
+            # A single pool is shared by all frames so each worker keeps its open readers
+            with self._live() as live, pool as executor:
+                for frames in frame_groups:
+                    # Update spinner with current tile info
+                    if len(frames) == 1:
+                        n = frames[0]
+                        text = f"Generating tiles for frame {n + 1}/\
+                            {len(frame_infos)}: {frame_infos[n].name}"
+                    else:
+                        text = f"Generating animated tiles for {len(frames)} frames..."
+                    live.update(Spinner("dots", text=text))
 
-        # Clean up clipped rasters folder if it was created
-        self._cleanup_clipped_rasters()
+                    if self.pyramid:
+                        create = partial(create_pyramid, frames=frames)
+                        results = self._map(executor, create, roots, max_pending)
+                        self._create_pyramid_parents(roots, results, frames)
+                        self.manifest.add_tiles(self.tiles)
+                        completed += len(roots)
+                        self._report_progress("rendering", completed, total)
+                    else:
+                        create = partial(create_tiles, frames=frames)
+                        results = self._map(
+                            executor, create, self._work_units(pending), max_pending
+                        )
+                        columns = self._work_units(pending)
+                        for column, stats in zip(columns, results, strict=True):
+                            self.stats.merge(stats)
+                            completed += 1
+                            self._report_progress("rendering", completed, total)
+                            # Tile-major APNGs are finished as soon as their column is done
+                            if self.mode == "tile_major":
+                                self.manifest.add_tiles(column)
+                    self.manifest.add_frames(frames)
+        finally:
+            # Close the readers kept open by the worker threads
+            self.reader_cache.close()
 
 
 # Define a class for the xarray engine
@@ -311,13 +1646,39 @@ class XArrayEngine(TileEngine):
     Represents an xarray tiler.
     """
 
-    def __init__(self, *args, **kwargs):
+    # Bounds of the dask chunk size along x and y, in pixels
+    MIN_CHUNK_SIZE = 256
+    MAX_CHUNK_SIZE = 4096
+
+    def __init__(self, *args, variable: Optional[str] = None, **kwargs):
         """
         Initialize the XarrayEngine class.
+
+        ``data`` can be an in-memory or dask-backed DataArray, a Dataset (e.g. from
+        ``xr.open_zarr`` or ``xr.open_mfdataset``), or the path of a Zarr store or of NetCDF
+        files (a glob is accepted), which is opened lazily.
+
+        Args:
+            variable (str, optional): The variable to animate when ``data`` is a Dataset or a
+                path. Not needed if the dataset has a single variable.
         """
         super().__init__(*args, **kwargs)
+        if isinstance(self.data, (str, Path)):
+            self.data = self._open_dataset(self.data)
+        if isinstance(self.data, xr.Dataset):
+            if variable is None and len(self.data.data_vars) != 1:
+                raise ValueError(
+                    f"Dataset has several variables {list(self.data.data_vars)}; "
+                    "set 'variable' to the one to animate."
+                )
+            self.data = self.data[variable or next(iter(self.data.data_vars))]
         if not isinstance(self.data, xr.DataArray):
-            raise ValueError("For engine 'xarray', 'data' must be an xarray.DataArray.")
+            raise ValueError(
+                "For engine 'xarray', 'data' must be an xarray.DataArray, an xarray.Dataset "
+                "or the path of a Zarr store or NetCDF files."
+            )
+        if self.data.rio.crs is None:
+            raise ValueError("The xarray data has no CRS; set one with data.rio.write_crs().")
 
         # Note: vector_file parameter is ignored for xarray engine
         if self.vector_file:
@@ -326,81 +1687,152 @@ class XArrayEngine(TileEngine):
                 style="bold yellow",
             )
 
-    def _create_tile(
-        self,
-        tile: mercantile.Tile = None,
-        da: xr.DataArray = None,
-        n: int = 0,
-        colormap: Optional[ColorMapType] = None,
-    ):
+    def _read_tile(self, tile: mercantile.Tile, n: int) -> ImageData:
         """
-        Generate a PNG tile from a xarray DataArray using rio-tiler.
+        Read time step ``n`` of a tile from the xarray DataArray using rio-tiler.
 
         Args:
             tile (mercantile.Tile): A mercantile tile object.
-            n (int): The index of the GeoTIFF file in the list of files.
-            num_bands (int): The number of bands in the GeoTIFF file.
-            indexes (int or sequence of int, optional): Band indexes.
-            colormap (dict or sequence, optional): RGBA Color Table dictionary or sequence.
-            vmin (float): The minimum value for rescaling the data.
-            vmax (float): The maximum value for rescaling the data.
+            n (int): The index of the time step.
         """
-        try:
-            with XarrayReader(da) as dst:
-                # Get the tile data and mask
-                img = dst.tile(tile.x, tile.y, tile.z, tilesize=self.TILE_SIZE)
-                # Convert the data to an image
-                # Rescale the data linearly from 0-10000 to 0-255
-                img.rescale(in_range=((self.vmin, self.vmax),), out_range=((0, 255),))
-                # Apply colormap and create a PNG buffer
-                buff = img.render(colormap=colormap, add_mask=True)
-                # Open the image from the buffer
-                image = Image.open(io.BytesIO(buff))
-
-                # Save the image as a PNG
-                number = "{:03d}".format(n)
-                tile_dir = os.path.join(self.output_folder, str(tile.z), str(tile.x))
-                tile_file = os.path.join(tile_dir, f"{tile.y}_{number}.png")
-                os.makedirs(tile_dir, exist_ok=True)
-                image.save(tile_file, "PNG")
-        except TileOutsideBounds:
-            pass
-        except Exception as e:
-            print(f"An error occurred while generating tiles: {e}")
+        with XarrayReader(self.frames[n]) as dst:
+            # Get the tile data and mask
+            return dst.tile(tile.x, tile.y, tile.z, tilesize=self.TILE_SIZE)
 
-    def _worker_create_tiles(self, da, n, tiles):
-        for tile in tiles:
-            self._create_tile(
-                tile,
-                da,
-                n,
-                self.color_map,
-            )
+    def _read_tiles(self, tiles: list, frames: list) -> list:
+        """
+        Read a time step of a block of neighbouring tiles as one window.
+        """
+        with XarrayReader(self.frames[frames[0]]) as dst:
+            return self._read_block(dst, tiles)
+
+    @staticmethod
+    def _open_dataset(path) -> xr.Dataset:
+        """
+        Lazily open a Zarr store or NetCDF files with dask, keeping their CRS.
+        """
+        if str(path).rstrip("/").endswith(".zarr"):
+            return xr.open_zarr(path, decode_coords="all")
+        return xr.open_mfdataset(path, chunks={}, decode_coords="all")
+
+    def _tile_chunk_size(self) -> int:
+        """
+        Return the chunk size along x and y so that a ``max_z`` tile spans at most 2x2 chunks.
+
+        This is the size of a ``max_z`` tile at the center of the data, in source pixels,
+        rounded up to a power of two.
+        """
+        crs = self.data.rio.crs
+        west, south, east, north = self.data.rio.transform_bounds("EPSG:4326")
+        tile = mercantile.tile((west + east) / 2, (south + north) / 2, self.max_z)
+        left, bottom, right, top = transform_bounds("EPSG:4326", crs, *mercantile.bounds(tile))
+        res_x, res_y = (abs(r) for r in self.data.rio.resolution())
+        pixels = max((right - left) / res_x, (top - bottom) / res_y, 1)
+        size = 2 ** int(np.ceil(np.log2(pixels)))
+        return int(np.clip(size, self.MIN_CHUNK_SIZE, self.MAX_CHUNK_SIZE))
+
+    def _align_chunks(self, time_coord="time"):
+        """
+        Rechunk dask-backed data to one time step and tile-sized windows per chunk, so each
+        tile read only pulls the blocks it needs. In-memory data is left as it is.
+        """
+        if self.data.chunks is None:
+            return
+
+        size = self._tile_chunk_size()
+        self.data = self.data.chunk(
+            {time_coord: 1, self.data.rio.y_dim: size, self.data.rio.x_dim: size}
+        )
 
     def _get_slice_data(self, time, time_coord="time"):
-        """Slice the raster dataset based on the time coordinate."""
-        da = self.data.isel({time_coord: time}).copy()
-        return da
+        """Slice the raster dataset based on the time coordinate, without loading or copying it."""
+        return self.data.isel({time_coord: time})
+
+    @staticmethod
+    def _valid_data_footprint(frame: xr.DataArray, max_size: int = 1024):
+        """
+        Compute the valid-data footprint of a time step in EPSG:4326.
+
+        The mask is coarsened to at most ``max_size`` pixels wide or high before it is
+        vectorised.
+        """
+        valid = frame.notnull()
+        if frame.rio.nodata is not None and not np.isnan(frame.rio.nodata):
+            valid &= frame != frame.rio.nodata
+
+        x_dim, y_dim = frame.rio.x_dim, frame.rio.y_dim
+        scale = max(1, -(-max(valid.sizes[x_dim], valid.sizes[y_dim]) // max_size))
+        if scale > 1:
+            valid = valid.coarsen({x_dim: scale, y_dim: scale}, boundary="pad").max()
+
+        transform = frame.rio.transform() * Affine.scale(scale)
+        return mask_footprint(valid.values, transform, frame.rio.crs)
 
     def generate_tiles(self, time_coord="time"):
         """
         Generate tiles from a xarray array.
         """
+        self._align_chunks(time_coord)
         # Get the time coordinates
         time_coords = self.data[time_coord].values
         # Get the bounding box
         bbox = list(self.data.rio.bounds())
 
-        # Calculate the tiles within the bounding box at the given zoom level
-        tiles = list(mercantile.tiles(bbox[0], bbox[1], bbox[2], bbox[3], zooms=self.zooms))
+        self.frames = [self._get_slice_data(n, time_coord) for n in range(len(time_coords))]
 
-        tasks = [
-            dask.delayed(self._worker_create_tiles)(self._get_slice_data(n, time_coord), n, tiles)
-            for n in range(len(time_coords))
-        ]
+        # Calculate the tiles covering the data at the given zoom levels
+        footprint = None
+        if self.tile_cover == "footprint":
+            footprint = self._valid_data_footprint(self.frames[0])
+        self._set_tiles(bbox, footprint)
+        self.num_frames = len(self.frames)
+        self.blank_png = self._render_blank()
+
+        # Skip the work recorded by a previous run of the same data and parameters
+        self._open_manifest([dask.base.tokenize(frame) for frame in self.frames])
+        frame_groups = self._frame_groups(len(self.frames))
+        columns = list(self._work_units(self._pending_tiles()))
+        workers = self.budget.workers if self.budget else os.cpu_count()
+
+        if self.pyramid:
+            # One task per pyramid subtree and frame group; the levels above the subtrees
+            # are built once their results are in
+            roots = self._pyramid_roots(workers)
+            tasks = [
+                dask.delayed(self._budgeted(self._create_pyramid_root))(root, frames)
+                for frames in frame_groups
+                for root in roots
+            ]
+        elif self.mode == "tile_major":
+            # One task per z/x column of tiles, each rendering every time step
+            tasks = [
+                dask.delayed(self._budgeted(self._create_tiles))(column, frames)
+                for frames in frame_groups
+                for column in columns
+            ]
+        else:
+            tasks = [
+                dask.delayed(self._budgeted(self._create_tiles))(self.tiles, frames)
+                for frames in frame_groups
+            ]
+
+        self._report_progress("rendering", 0, len(tasks))
+        with self._live() as live:
+            live.update(
+                Spinner("dots", text=f"Processing {len(time_coords)} time frames with dask...")
+            )
+            # Under a worker budget, tasks beyond this layer's slots wait in their thread
+            results = dask.compute(*tasks, num_workers=workers)
+            self._report_progress("rendering", len(tasks), len(tasks))
+
+            if self.pyramid:
+                for i, frames in enumerate(frame_groups):
+                    group = results[i * len(roots) : (i + 1) * len(roots)]
+                    self._create_pyramid_parents(roots, group, frames)
+            else:
+                for stats in results:
+                    self.stats.merge(stats)
 
-        with Live(
-            Spinner("dots", text=f"Processing {len(time_coords)} time frames with dask..."),
-            console=console,
-        ):
-            dask.compute(*tasks)
+        if frame_groups and self.mode == "tile_major":
+            self.manifest.add_tiles(self.tiles)
+        self.manifest.add_frames(n for frames in frame_groups for n in frames)
@@ -0,0 +1,249 @@
+"""
+Persistent catalog of the frames of an animated layer and their raster metadata, so repeat
+runs don't reopen every frame.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+import rasterio
+import shapely
+from rich.console import Console
+
+from helpers.raster_ops import raster_info_in_4326, valid_data_footprint
+
+from .utils import parse_frame_date
+
+console = Console()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    name TEXT PRIMARY KEY,
+    date INTEGER,
+    west REAL, south REAL, east REAL, north REAL,
+    crs TEXT,
+    transform TEXT,
+    width INTEGER,
+    height INTEGER,
+    count INTEGER,
+    dtype TEXT,
+    nodata REAL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    hash TEXT,
+    footprint BLOB
+);
+"""
+
+_COLUMNS = (
+    "name, date, west, south, east, north, crs, transform, width, height, count, dtype, "
+    "nodata, size, mtime_ns, hash"
+)
+
+
+class FrameInfo(NamedTuple):
+    """
+    The metadata of a frame recorded in the catalog.
+    """
+
+    name: str
+    date: int
+    bounds: Tuple[float, float, float, float]
+    crs: str
+    transform: Tuple[float, ...]
+    width: int
+    height: int
+    count: int
+    dtype: str
+    nodata: Optional[float]
+    size: int
+    mtime_ns: int
+    hash: str
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "FrameInfo":
+        """
+        Read a row of the catalog, in ``_COLUMNS`` order.
+        """
+        name, date, west, south, east, north, crs, transform, *rest = row
+        return cls(name, date, (west, south, east, north), crs, tuple(json.loads(transform)), *rest)
+
+    def to_row(self) -> tuple:
+        """
+        The row of the catalog, in ``_COLUMNS`` order.
+        """
+        name, date, bounds, crs, transform, *rest = self
+        return (name, date, *bounds, crs, json.dumps(transform), *rest)
+
+
+def content_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of the content of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FrameCatalog:
+    """
+    SQLite catalog of a folder of frames, stored next to it as ``{input_folder}.catalog.sqlite``.
+
+    It records the date, EPSG:4326 bounds, grid, data type, nodata, size, modification time
+    and content hash of every frame. A refresh only opens and hashes the frames that are new
+    or whose size or modification time changed; a frame only touched keeps its metadata.
+    The valid-data footprint of a frame is computed the first time it is asked for.
+    """
+
+    def __init__(self, input_folder: Path):
+        """
+        Initialize the FrameCatalog class. The database is created on first use.
+
+        Args:
+            input_folder (Path): The folder of the frames.
+        """
+        input_folder = Path(input_folder)
+        self.input_folder = input_folder
+        self.path = input_folder.parent / f"{input_folder.name}.catalog.sqlite"
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        The SQLite connection, opened on first use.
+        """
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self):
+        """
+        Close the SQLite connection.
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _scan(self, name: str, date: int, stat: os.stat_result, recorded: Optional[FrameInfo]):
+        """
+        Read the metadata of a new or modified frame.
+
+        Returns:
+            FrameInfo or None: The metadata, or None if the file is not a raster.
+        """
+        path = self.input_folder / name
+        digest = content_hash(path)
+        if recorded is not None and recorded.hash == digest:
+            return recorded._replace(date=date, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+        try:
+            info = raster_info_in_4326(path)
+        except rasterio.errors.RasterioIOError:
+            console.print(f"⚠️ Skipping {path}: not a raster", style="bold yellow")
+            return None
+        return FrameInfo(
+            name,
+            date,
+            info.bounds,
+            info.crs,
+            info.transform,
+            info.width,
+            info.height,
+            info.count,
+            info.dtype,
+            info.nodata,
+            stat.st_size,
+            stat.st_mtime_ns,
+            digest,
+        )
+
+    def refresh(self, date_format: str = "DDMMYYYY") -> List[FrameInfo]:
+        """
+        Bring the catalog up to date with the folder and list its frames.
+
+        Args:
+            date_format (str): Expected date format in filenames, see ``parse_frame_date``.
+
+        Returns:
+            list of FrameInfo: The frames, sorted by date.
+        """
+        rows = self.conn.execute(f"SELECT {_COLUMNS} FROM frames").fetchall()
+        recorded = {row[0]: FrameInfo.from_row(row) for row in rows}
+
+        frames, changed = [], []
+        for name in os.listdir(self.input_folder):
+            date = parse_frame_date(name, date_format)
+            if date is None or not (self.input_folder / name).is_file():
+                continue
+            stat = os.stat(self.input_folder / name)
+            info = recorded.pop(name, None)
+            if info is None or (info.size, info.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                info = self._scan(name, date, stat, info)
+                if info is None:
+                    continue
+                changed.append(info)
+            elif info.date != date:
+                # The date format changed
+                info = info._replace(date=date)
+                changed.append(info)
+            frames.append(info)
+
+        if changed or recorded:
+            with self.conn:
+                self.conn.executemany(
+                    "DELETE FROM frames WHERE name = ?", [(name,) for name in recorded]
+                )
+                # A frame whose content changed needs a new footprint
+                self.conn.executemany(
+                    f"INSERT INTO frames ({_COLUMNS}) VALUES ({', '.join('?' * 16)}) "
+                    "ON CONFLICT (name) DO UPDATE SET "
+                    + ", ".join(f"{c} = excluded.{c}" for c in _COLUMNS.split(", ")[1:])
+                    + ", footprint = CASE WHEN hash = excluded.hash THEN footprint END",
+                    [info.to_row() for info in changed],
+                )
+            console.print(
+                f"🗂️ Frame catalog: {len(frames)} frames, {len(changed)} new or modified, "
+                f"{len(recorded)} removed",
+                style="bold blue",
+            )
+        return sorted(frames, key=lambda info: info.date)
+
+    @staticmethod
+    def bounds(frames: List[FrameInfo]) -> Tuple[float, float, float, float]:
+        """
+        The union of the EPSG:4326 bounds of the frames.
+        """
+        west, south, east, north = zip(*(info.bounds for info in frames), strict=True)
+        return min(west), min(south), max(east), max(north)
+
+    def footprint(self, frames: List[FrameInfo]) -> shapely.Geometry:
+        """
+        The union of the valid-data footprints of the frames in EPSG:4326. The footprints
+        that aren't in the catalog yet are computed and recorded.
+        """
+        names = [info.name for info in frames]
+        rows = self.conn.execute("SELECT name, footprint FROM frames WHERE footprint IS NOT NULL")
+        wanted = set(names)
+        stored = {name: wkb for name, wkb in rows if name in wanted}
+        missing = [name for name in names if name not in stored]
+        if missing:
+            with console.status(f"Computing the footprint of {len(missing)} frames..."):
+                for name in missing:
+                    stored[name] = shapely.to_wkb(
+                        valid_data_footprint(str(self.input_folder / name))
+                    )
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE frames SET footprint = ? WHERE name = ?",
+                    [(stored[name], name) for name in missing],
+                )
+
+        # Frames often share a footprint, each distinct one is merged once
+        return shapely.union_all(shapely.from_wkb(list(set(stored.values()))))
@@ -2,14 +2,22 @@
 
 from __future__ import annotations
 
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
 import yaml
 from matplotlib.colors import LinearSegmentedColormap
+from rich.console import Console
+from rich.progress import BarColumn, Progress, TaskProgressColumn, TextColumn, TimeElapsedColumn
 
 from data_processing.animated_tiles import AnimatedTiles
+from data_processing.worker_budget import WorkerBudget
+
+console = Console()
 
 
 def _hex_to_rgba(color: str) -> Tuple[int, int, int, int]:
@@ -211,20 +219,125 @@ def _build_colormap(layer: Dict[str, Any]) -> Dict[int, Tuple[int, int, int, int
     return cm
 
 
+# Optional layer keys forwarded as-is to the tile engine
+_ENGINE_OPTIONS = (
+    "executor",
+    "max_workers",
+    "queue_size",
+    "metatile",
+    "pyramid",
+    "pyramid_reducer",
+    "tile_cover",
+    "variable",
+    "delta_frames",
+    "palette",
+    "archive",
+    "prepare_cogs",
+    "overview_resampling",
+    "frame_cube",
+)
+
+
 def _resolve_path(base_dir: Path, value: str) -> str:
     p = Path(value)
     return str(p if p.is_absolute() else (base_dir / p).resolve())
 
 
+def _animated_tiles(
+    layer: Dict[str, Any], config_dir: Path, force: bool, **options: Any
+) -> AnimatedTiles:
+    cm = _build_colormap(layer)
+    engine_options = {k: layer[k] for k in _ENGINE_OPTIONS if k in layer}
+    if "vector_file" in layer:
+        engine_options["vector_file"] = _resolve_path(config_dir, layer["vector_file"])
+    if layer.get("pyramid"):
+        # Averaging would invent classes between categories
+        categorical = layer["colormap"]["type"] == "categorical"
+        engine_options.setdefault("pyramid_reducer", "mode" if categorical else "mean")
+
+    return AnimatedTiles(
+        data=_resolve_path(config_dir, layer["input_folder"]),
+        output_folder=_resolve_path(config_dir, layer["output_folder"]),
+        min_z=int(layer["min_z"]),
+        max_z=int(layer["max_z"]),
+        color_map=cm,
+        vmin=float(layer["vmin"]),
+        vmax=float(layer["vmax"]),
+        engine=layer.get("engine", "rasterio"),
+        date_format=layer.get("date_format"),
+        mode=layer.get("mode", "frame_major"),
+        force=force,
+        **engine_options,
+        **options,
+    )
+
+
+def _run_layer(layer_id: str, create: Callable[[], AnimatedTiles]) -> Dict[str, Any]:
+    """Run one layer and return its line of the summary."""
+    start = time.perf_counter()
+    try:
+        animated_tiles = create()
+        animated_tiles.create()
+    except Exception as e:
+        return {
+            "layer": layer_id,
+            "status": "failed",
+            "error": e,
+            "wall": time.perf_counter() - start,
+        }
+    report = animated_tiles.report
+    return {
+        "layer": layer_id,
+        "status": "done" if report else "up to date",
+        "tiles": report["counts"]["written"] if report else 0,
+        "wall": time.perf_counter() - start,
+    }
+
+
+def _print_summary(results: List[Dict[str, Any]], wall: float, workers: int) -> None:
+    console.print(
+        f"🏁 {len(results)} animated layers in {wall:.1f}s with {workers} workers",
+        style="bold green",
+    )
+    for result in results:
+        if result["status"] == "failed":
+            console.print(
+                f"   ❌ {result['layer']:<30} failed after {result['wall']:.1f}s: "
+                f"{result['error']}",
+                style="bold red",
+            )
+        else:
+            tiles = f"{result['tiles']} tiles" if result["status"] == "done" else "up to date"
+            console.print(
+                f"   ✅ {result['layer']:<30} {tiles:>14} in {result['wall']:8.1f}s",
+                style="green",
+            )
+
+
 def process_animated_layers(
     config_path: str,
     layer_ids: Optional[List[str]] = None,
+    force: bool = False,
+    max_workers: Optional[int] = None,
+    max_concurrent_layers: Optional[int] = None,
 ) -> None:
     """Process animated layers defined in a YAML config.
 
+    Several layers are processed concurrently under a single budget of ``max_workers``
+    rendering and assembly workers. A free worker goes to the layer running the fewest
+    tasks, so a large layer only takes the workers the smaller ones leave idle. The
+    progress of every layer is shown together, followed by a summary of all of them. A
+    failing layer does not stop the others; the failures are raised together at the end.
+
     Args:
         config_path: Path to the animated layer YAML configuration file.
         layer_ids: Optional list of layer IDs to process. If None, process all layers.
+        force: Regenerate every tile. By default a rerun only regenerates the tiles that are
+            missing or stale (changed source files or rendering parameters).
+        max_workers: Number of workers shared by all the layers. Defaults to the number of
+            CPUs. A layer's own ``max_workers`` caps the size of its pool within it.
+        max_concurrent_layers: Number of layers processed at once. Defaults to as many as
+            the workers, 1 processes the layers one after another.
     """
     config_file = Path(config_path).resolve()
     config_dir = config_file.parent
@@ -234,24 +347,65 @@ def process_animated_layers(
 
     layers = config.get("layers", {})
     selected_ids = layer_ids if layer_ids else list(layers.keys())
-
     for layer_id in selected_ids:
         if layer_id not in layers:
             raise KeyError(f"Layer not found in config: {layer_id}")
 
-        layer = layers[layer_id]
-        cm = _build_colormap(layer)
-
-        animated_tiles = AnimatedTiles(
-            data=_resolve_path(config_dir, layer["input_folder"]),
-            output_folder=_resolve_path(config_dir, layer["output_folder"]),
-            min_z=int(layer["min_z"]),
-            max_z=int(layer["max_z"]),
-            color_map=cm,
-            vmin=float(layer["vmin"]),
-            vmax=float(layer["vmax"]),
-            engine=layer.get("engine", "rasterio"),
-            date_format=layer.get("date_format"),
+    budget = WorkerBudget(max_workers)
+    concurrent = min(max_concurrent_layers or budget.workers, len(selected_ids))
+    start = time.perf_counter()
+
+    if concurrent <= 1:
+        # One layer at a time, each with its own spinner
+        results = []
+        for layer_id in selected_ids:
+            options = {"budget": budget.share(layer_id)} if max_workers else {}
+            create = partial(_animated_tiles, layers[layer_id], config_dir, force, **options)
+            results.append(_run_layer(layer_id, create))
+    else:
+        console.print(
+            f"🚦 Processing {len(selected_ids)} animated layers, {concurrent} at a time, "
+            f"with {budget.workers} workers",
+            style="bold blue",
         )
-
-        animated_tiles.create()
+        with Progress(
+            TextColumn("{task.fields[layer]:<30}"),
+            TextColumn("{task.fields[stage]:<11}"),
+            BarColumn(),
+            TaskProgressColumn(),
+            TimeElapsedColumn(),
+            console=console,
+        ) as progress:
+            tasks = {
+                layer_id: progress.add_task("", total=None, layer=layer_id, stage="waiting")
+                for layer_id in selected_ids
+            }
+
+            def report(layer_id: str, stage: str, completed: int, total: int) -> None:
+                progress.update(tasks[layer_id], stage=stage, completed=completed, total=total)
+
+            def run(layer_id: str) -> Dict[str, Any]:
+                progress.update(tasks[layer_id], stage="starting")
+                create = partial(
+                    _animated_tiles,
+                    layers[layer_id],
+                    config_dir,
+                    force,
+                    budget=budget.share(layer_id),
+                    progress=partial(report, layer_id),
+                )
+                result = _run_layer(layer_id, create)
+                progress.update(tasks[layer_id], stage=result["status"], completed=1, total=1)
+                return result
+
+            with ThreadPoolExecutor(max_workers=concurrent) as executor:
+                results = list(executor.map(run, selected_ids))
+
+    _print_summary(results, time.perf_counter() - start, budget.workers)
+
+    failed = [result for result in results if result["status"] == "failed"]
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} animated layers failed: "
+            + ", ".join(result["layer"] for result in failed)
+        ) from failed[0]["error"]
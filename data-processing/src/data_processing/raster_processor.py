@@ -4,7 +4,10 @@ file and convert it to MBTiles format.
 """
 
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List
 
 import geopandas as gpd
 import numpy as np
@@ -15,10 +18,91 @@ from rich.console import Console
 from helpers.cog_converter import COGConverter
 from helpers.mapbox_uploader import upload_to_mapbox
 from helpers.mbtiles_converter import MBTilesConverterFactory
-from helpers.qml_parser import QMLParser
+from helpers.qml_parser import ColorEntry, QMLParser
+
+from .worker_budget import bounded_map
 
 console = Console()
 
+# Block size of the styled GeoTIFF when the source is not tiled
+STYLE_BLOCK_SIZE = 512
+
+# Largest range of integer values styled with a dense lookup table
+MAX_DENSE_LUT = 1 << 20
+
+
+class _PaletteLookup:
+    """
+    Exact value → color lookup of PALETTE / EXACT styles, touching every pixel once
+    whatever the number of entries.
+
+    Integer rasters index a dense table of the colors of every integer value: the whole
+    range of 8 and 16-bit types, the range of the entries otherwise. Float rasters, and
+    integer entries too sparse for a dense table, look pixels up in the sorted entry values.
+    Values without an entry are transparent. When several entries share a value the last
+    one wins, as when the entries were painted one after the other.
+    """
+
+    def __init__(self, entries: List[ColorEntry], dtype: np.dtype):
+        """
+        Initialize the _PaletteLookup class.
+
+        Args:
+            entries (list of ColorEntry): The color entries, sorted by value.
+            dtype (np.dtype): The data type of the raster.
+        """
+        # The last entry of each value, then a transparent color for the other values
+        last = {entry.value: entry for entry in entries}
+        self.values = np.array(list(last), dtype=np.float64)
+        colors = np.zeros((len(last) + 1, 4), dtype=np.uint8)
+        colors[:-1] = [(e.r, e.g, e.b, e.a) for e in last.values()]
+        # One 32-bit word per color, so a pixel is looked up with a single gather
+        self.colors = colors.view(np.uint32)[:, 0]
+
+        self.dtype = np.dtype(dtype)
+        self.lut = None
+        if self.dtype.kind not in "iu":
+            return
+        integers = [int(v) for v in self.values if v.is_integer()]
+        info = np.iinfo(self.dtype)
+        if self.dtype.itemsize <= 2:
+            self.low, self.high = info.min, info.max
+        elif integers and max(integers) - min(integers) + 2 < MAX_DENSE_LUT:
+            # Pixels out of range are clipped onto the transparent slots at both ends
+            self.low, self.high = min(integers) - 1, max(integers) + 1
+        else:
+            return
+        self.lut = np.full(self.high - self.low + 1, self.colors[-1], dtype=np.uint32)
+        for value in integers:
+            if self.low <= value <= self.high:
+                self.lut[value - self.low] = self.colors[np.searchsorted(self.values, value)]
+
+    def __call__(self, data: np.ndarray) -> np.ndarray:
+        """
+        Look up the colors of a block of the raster.
+
+        Returns:
+            np.ndarray: The 4 x height x width RGBA block.
+        """
+        if self.lut is not None:
+            if self.dtype.itemsize <= 2:
+                # The table covers the whole range of the type, no pixel needs clipping
+                index = data if self.low == 0 else data.astype(np.int32) - self.low
+            else:
+                index = np.clip(data.astype(np.int64), self.low, self.high) - self.low
+            pixels = self.lut[index]
+        else:
+            values = data.astype(np.float64)
+            index = np.searchsorted(self.values, values)
+            index[index == len(self.values)] = 0
+            # Pixels without an entry take the transparent color
+            index[self.values[index] != values] = len(self.values)
+            pixels = self.colors[index]
+        height, width = data.shape
+        return np.ascontiguousarray(
+            pixels.view(np.uint8).reshape(height, width, 4).transpose(2, 0, 1)
+        )
+
 
 class RasterProcessor:
     """
@@ -35,6 +119,7 @@ class RasterProcessor:
         create_mbtiles: bool = True,
         vector_file: Path = None,
         max_zoom: int = None,
+        max_workers: int = None,
     ):
         """
         Initialize the RasterProcessor object.
@@ -48,6 +133,8 @@ class RasterProcessor:
             create_mbtiles (bool): Whether to create an MBTiles file.
             vector_file (Path): Optional path to a shapefile for clipping the raster.
             max_zoom (int): Maximum zoom level for COG conversion.
+            max_workers (int): Number of threads styling the raster. Defaults to the number
+                of CPUs.
         """
         self.input_file = input_file
         self.qml_file = qml_file
@@ -57,6 +144,7 @@ class RasterProcessor:
         self.create_mbtiles = create_mbtiles
         self.vector_file = vector_file
         self.max_zoom = max_zoom
+        self.max_workers = max_workers
         self.clipped_raster_path = None
 
     def clip_raster(self) -> Path:
@@ -117,17 +205,92 @@ class RasterProcessor:
             console.print(f"❌ Error clipping raster: {e}", style="bold red")
             return self.input_file
 
+    @staticmethod
+    def _style_block(
+        data: np.ndarray,
+        mode: str,
+        entries: List[ColorEntry],
+        nodata: float = None,
+        palette: _PaletteLookup = None,
+    ) -> np.ndarray:
+        """
+        Apply the QML colormap to a block of the raster.
+
+        Args:
+            data (np.ndarray): The block of band 1.
+            mode (str): The QML renderer mode, see ``QMLParser.parse_full``.
+            entries (list of ColorEntry): The color entries.
+            nodata (float): The nodata value of the raster.
+            palette (_PaletteLookup): The lookup of PALETTE / EXACT styles, built once for
+                all the blocks. Built from ``entries`` if not given.
+
+        Returns:
+            np.ndarray: The 4 x height x width RGBA block.
+        """
+        if mode not in ("INTERPOLATED", "DISCRETE"):  # PALETTE / EXACT
+            rgba = (palette or _PaletteLookup(entries, data.dtype))(data)
+            # Nodata → transparent, compared as float64 like the other modes
+            if nodata is not None:
+                rgba[3][data == np.float64(nodata)] = 0
+            return rgba
+
+        data = data.astype(np.float64)
+        height, width = data.shape
+        rgba = np.zeros((4, height, width), dtype=np.uint8)
+
+        values = np.array([e.value for e in entries])
+        r_stops = np.array([e.r for e in entries])
+        g_stops = np.array([e.g for e in entries])
+        b_stops = np.array([e.b for e in entries])
+        a_stops = np.array([e.a for e in entries])
+
+        if mode == "INTERPOLATED":
+            flat = data.ravel()
+            rgba[0] = np.interp(flat, values, r_stops).reshape(height, width).astype(np.uint8)
+            rgba[1] = np.interp(flat, values, g_stops).reshape(height, width).astype(np.uint8)
+            rgba[2] = np.interp(flat, values, b_stops).reshape(height, width).astype(np.uint8)
+            rgba[3] = np.interp(flat, values, a_stops).reshape(height, width).astype(np.uint8)
+
+        elif mode == "DISCRETE":
+            # Each item value is an upper bound; assign the first stop >= pixel value
+            indices = np.searchsorted(values, data.ravel(), side="left")
+            indices = np.clip(indices, 0, len(entries) - 1).reshape(height, width)
+            rgba[0] = r_stops[indices]
+            rgba[1] = g_stops[indices]
+            rgba[2] = b_stops[indices]
+            rgba[3] = a_stops[indices]
+
+        # Nodata → transparent
+        if nodata is not None:
+            rgba[3][data == nodata] = 0
+
+        return rgba
+
+    @staticmethod
+    def _block_size(src) -> int:
+        """
+        The block size of the styled GeoTIFF: the source's own when it is tiled, so every
+        source block is decoded once, else ``STYLE_BLOCK_SIZE``.
+        """
+        height, width = src.block_shapes[0]
+        if width < src.width and height == width and width % 16 == 0:
+            return width
+        return STYLE_BLOCK_SIZE
+
     def apply_styles(self, raster_path: Path = None) -> Path:
         """
-        Apply the QML colormap to the raster and write an RGBA GeoTIFF.
+        Apply the QML colormap to the raster and write a tiled RGBA GeoTIFF.
 
         Supports all three QML renderer modes:
         - DISCRETE: items are upper-bound range stops (np.searchsorted)
         - INTERPOLATED: colors linearly interpolated between stops (np.interp)
-        - PALETTE / EXACT: exact integer value → color lookup
+        - PALETTE / EXACT: exact value → color lookup table (see ``_PaletteLookup``)
 
         Nodata pixels are set to fully transparent (alpha=0).
 
+        The raster is styled one block at a time by a pool of threads and written block by
+        block, so memory grows with the number of workers, not with the raster size.
+
         Args:
             raster_path (Path): Optional path to the raster file. Falls back to
                                 the clipped raster or the original input file.
@@ -143,51 +306,56 @@ class RasterProcessor:
                 raise ValueError(f"No color entries found in {self.qml_file}")
 
             with rasterio.open(file_path) as src:
-                data = src.read(1).astype(np.float64)
                 nodata = src.nodata
                 meta = src.meta.copy()
+                block_size = self._block_size(src)
+                dtype = src.dtypes[0]
+            palette = None
+            if mode not in ("INTERPOLATED", "DISCRETE"):
+                palette = _PaletteLookup(entries, dtype)
+
+            meta.update(
+                {
+                    "driver": "GTiff",
+                    "dtype": "uint8",
+                    "count": 4,
+                    "nodata": None,
+                    "tiled": True,
+                    "blockxsize": block_size,
+                    "blockysize": block_size,
+                }
+            )
 
-            height, width = data.shape
-            rgba = np.zeros((4, height, width), dtype=np.uint8)
-
-            values = np.array([e.value for e in entries])
-            r_stops = np.array([e.r for e in entries])
-            g_stops = np.array([e.g for e in entries])
-            b_stops = np.array([e.b for e in entries])
-            a_stops = np.array([e.a for e in entries])
-
-            if mode == "INTERPOLATED":
-                flat = data.ravel()
-                rgba[0] = np.interp(flat, values, r_stops).reshape(height, width).astype(np.uint8)
-                rgba[1] = np.interp(flat, values, g_stops).reshape(height, width).astype(np.uint8)
-                rgba[2] = np.interp(flat, values, b_stops).reshape(height, width).astype(np.uint8)
-                rgba[3] = np.interp(flat, values, a_stops).reshape(height, width).astype(np.uint8)
-
-            elif mode == "DISCRETE":
-                # Each item value is an upper bound; assign the first stop >= pixel value
-                indices = np.searchsorted(values, data.ravel(), side="left")
-                indices = np.clip(indices, 0, len(entries) - 1).reshape(height, width)
-                rgba[0] = r_stops[indices]
-                rgba[1] = g_stops[indices]
-                rgba[2] = b_stops[indices]
-                rgba[3] = a_stops[indices]
-
-            else:  # PALETTE / EXACT
-                for entry in entries:
-                    mask = data == entry.value
-                    rgba[0][mask] = entry.r
-                    rgba[1][mask] = entry.g
-                    rgba[2][mask] = entry.b
-                    rgba[3][mask] = entry.a
-
-            # Nodata → transparent
-            if nodata is not None:
-                rgba[3][data == nodata] = 0
-
-            meta.update({"driver": "GTiff", "dtype": "uint8", "count": 4, "nodata": None})
-
-            with rasterio.open(self.output_file, "w", **meta) as dst:
-                dst.write(rgba)
+            # Datasets can't be shared between threads, each worker opens its own
+            local = threading.local()
+            readers = []
+
+            def style(window):
+                if not hasattr(local, "src"):
+                    local.src = rasterio.open(file_path)
+                    readers.append(local.src)
+                data = local.src.read(1, window=window)
+                return window, self._style_block(data, mode, entries, nodata, palette)
+
+            workers = self.max_workers or os.cpu_count()
+            # Written under a temporary name so a failure never leaves a partial output
+            tmp_path = Path(self.output_file).with_suffix(f".{os.getpid()}.tmp")
+            try:
+                with (
+                    rasterio.open(tmp_path, "w", **meta) as dst,
+                    ThreadPoolExecutor(max_workers=workers) as executor,
+                ):
+                    windows = (window for _, window in dst.block_windows(1))
+                    # At most two blocks per worker are styled and not yet written
+                    for window, rgba in bounded_map(executor, style, windows, 2 * workers):
+                        dst.write(rgba, window=window)
+                os.replace(tmp_path, self.output_file)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            finally:
+                for reader in readers:
+                    reader.close()
 
         except Exception as e:
             console.print(f"❌ Error applying styles: {e}", style="bold red")
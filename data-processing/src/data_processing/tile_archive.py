@@ -0,0 +1,563 @@
+"""
+Single-file archives of animated tiles, so a layer is stored and uploaded as one file instead
+of one file per tile.
+
+Two formats are supported:
+
+- MBTiles: a SQLite database. Tiles are stored once per distinct content (the deduplicated
+  ``images``/``map`` schema, read through the standard ``tiles`` view) and can be added
+  concurrently and incrementally, so it is also the staging store of a run.
+- PMTiles (v3): a read-only archive with the tiles clustered in Hilbert order behind a compact
+  directory, served straight from object storage with HTTP range requests.
+
+Usage (from ``src/``):
+    python -m data_processing.tile_archive pack {tile_dir} {archive}
+    python -m data_processing.tile_archive extract {archive} {tile_dir}
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+import mercantile
+
+ARCHIVE_FORMATS = ("mbtiles", "pmtiles")
+
+_MBTILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS images (tile_id TEXT PRIMARY KEY, tile_data BLOB);
+CREATE TABLE IF NOT EXISTS map (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_id TEXT,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+);
+CREATE VIEW IF NOT EXISTS tiles AS
+    SELECT zoom_level, tile_column, tile_row, tile_data
+    FROM map JOIN images ON images.tile_id = map.tile_id;
+"""
+
+# PMTiles v3 constants, see https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md
+_PMTILES_HEADER_SIZE = 127
+_PMTILES_ROOT_MAX_SIZE = 16384 - _PMTILES_HEADER_SIZE
+_PMTILES_COMPRESSION_NONE = 1
+_PMTILES_COMPRESSION_GZIP = 2
+_PMTILES_TILE_TYPE_PNG = 2
+
+
+def archive_path(output_folder: Path, archive: str) -> Path:
+    """
+    The archive written instead of ``output_folder``: ``{output_folder}.{archive}``.
+    """
+    output_folder = Path(output_folder)
+    return output_folder.parent / f"{output_folder.name}.{archive}"
+
+
+def _tms_row(tile: mercantile.Tile) -> int:
+    # MBTiles rows count from the south
+    return (1 << tile.z) - 1 - tile.y
+
+
+def _metadata_value(name: str, value) -> str:
+    # MBTiles stores bounds and center as comma-separated numbers, anything else as JSON
+    if isinstance(value, str):
+        return value
+    if name in ("bounds", "center"):
+        return ",".join(str(v) for v in value)
+    return json.dumps(value)
+
+
+class MBTilesArchive:
+    """
+    MBTiles archive that worker threads and processes write to concurrently.
+
+    Every thread opens its own connection to the database, which is in WAL mode so readers
+    never block the writer and a tile insert doesn't wait for a sync to disk.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Initialize the MBTilesArchive class. The database is created on first use.
+
+        Args:
+            path (Path): The ``.mbtiles`` file.
+        """
+        self.path = Path(path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns = []
+        self._pid = os.getpid()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        The calling thread's connection, opened on first use.
+        """
+        if self._pid != os.getpid():
+            # Forked worker: the parent's connections must not be used
+            self.__init__(self.path)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(_MBTILES_SCHEMA)
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def __getstate__(self):
+        """
+        Drop the connections when pickled: they stay in the process that opened them.
+        """
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled archive, without connections.
+        """
+        self.__init__(state["path"])
+
+    def close(self):
+        """
+        Close the connections opened by every thread.
+        """
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._local = threading.local()
+
+    def put_tiles(self, tiles: Iterable[Tuple[mercantile.Tile, bytes]]):
+        """
+        Add or replace tiles, in a single transaction. Identical tiles are stored once.
+        """
+        tiles = [(tile, data, hashlib.sha256(data).hexdigest()) for tile, data in tiles]
+        with self.conn as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO images VALUES (?, ?)",
+                [(digest, data) for _, data, digest in tiles],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO map VALUES (?, ?, ?, ?)",
+                [(tile.z, tile.x, _tms_row(tile), digest) for tile, _, digest in tiles],
+            )
+
+    def put_tile(self, tile: mercantile.Tile, data: bytes):
+        """
+        Add or replace a tile.
+        """
+        self.put_tiles([(tile, data)])
+
+    def tiles(self) -> Iterator[Tuple[mercantile.Tile, bytes]]:
+        """
+        Iterate over every tile and its data.
+        """
+        rows = self.conn.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles")
+        for z, x, row, data in rows:
+            yield mercantile.Tile(x, (1 << z) - 1 - row, z), data
+
+    def clear(self):
+        """
+        Remove every tile.
+        """
+        with self.conn as conn:
+            conn.execute("DELETE FROM map")
+            conn.execute("DELETE FROM images")
+
+    def stats(self) -> dict:
+        """
+        Number of tiles, of distinct tiles, and bytes saved by storing identical tiles once.
+        """
+        tiles, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(tile_data)), 0) FROM tiles"
+        ).fetchone()
+        unique, stored = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(tile_data)), 0) FROM images"
+        ).fetchone()
+        return {"tiles": tiles, "unique": unique, "bytes_saved": total - stored}
+
+    def finish(self, metadata: dict) -> dict:
+        """
+        Write the metadata, drop the tile contents no tile uses anymore and turn the database
+        back into a single file.
+
+        Args:
+            metadata (dict): MBTiles metadata, e.g. ``name``, ``format``, ``bounds``,
+                ``minzoom`` and ``maxzoom``.
+
+        Returns:
+            dict: See ``stats``.
+        """
+        with self.conn as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+                [(name, _metadata_value(name, value)) for name, value in metadata.items()],
+            )
+            conn.execute("DELETE FROM images WHERE tile_id NOT IN (SELECT tile_id FROM map)")
+        stats = self.stats()
+        self.close()
+
+        # Checkpoint the write-ahead log so the archive is one self-contained file
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+        return stats
+
+
+def zxy_to_tileid(z: int, x: int, y: int) -> int:
+    """
+    The PMTiles tile ID: tiles of lower zooms first, then the position along a Hilbert curve.
+    """
+    tile_id = ((1 << (2 * z)) - 1) // 3
+    n = 1 << z
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        tile_id += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x, y = n - 1 - x, n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return tile_id
+
+
+def tileid_to_zxy(tile_id: int) -> mercantile.Tile:
+    """
+    The tile of a PMTiles tile ID, see ``zxy_to_tileid``.
+    """
+    z = 0
+    while tile_id >= ((1 << (2 * (z + 1))) - 1) // 3:
+        z += 1
+    d = tile_id - ((1 << (2 * z)) - 1) // 3
+    x = y = 0
+    s = 1
+    while s < (1 << z):
+        rx = 1 & (d >> 1)
+        ry = 1 & (d ^ rx)
+        if ry == 0:
+            if rx == 1:
+                x, y = s - 1 - x, s - 1 - y
+            x, y = y, x
+        x += s * rx
+        y += s * ry
+        d >>= 2
+        s <<= 1
+    return mercantile.Tile(x, y, z)
+
+
+def _write_varint(buff: bytearray, value: int):
+    while value >= 0x80:
+        buff.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buff.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _serialize_directory(entries: list) -> bytes:
+    """
+    Serialize and compress (tile ID, offset, length, run length) directory entries.
+    """
+    buff = bytearray()
+    _write_varint(buff, len(entries))
+    last_id = 0
+    for tile_id, _, _, _ in entries:
+        _write_varint(buff, tile_id - last_id)
+        last_id = tile_id
+    for _, _, _, run_length in entries:
+        _write_varint(buff, run_length)
+    for _, _, length, _ in entries:
+        _write_varint(buff, length)
+    for i, (_, offset, _, _) in enumerate(entries):
+        # 0 means "right after the previous entry", which is the common case when clustered
+        previous = entries[i - 1] if i else None
+        if previous and offset == previous[1] + previous[2]:
+            _write_varint(buff, 0)
+        else:
+            _write_varint(buff, offset + 1)
+    return gzip.compress(bytes(buff), mtime=0)
+
+
+def _deserialize_directory(data: bytes) -> list:
+    data = gzip.decompress(data)
+    num_entries, pos = _read_varint(data, 0)
+    columns = []
+    for _ in range(4):
+        column = []
+        for _ in range(num_entries):
+            value, pos = _read_varint(data, pos)
+            column.append(value)
+        columns.append(column)
+    deltas, run_lengths, lengths, offsets = columns
+
+    entries = []
+    tile_id = 0
+    for i in range(num_entries):
+        tile_id += deltas[i]
+        if offsets[i] == 0 and i:
+            offset = entries[-1][1] + entries[-1][2]
+        else:
+            offset = offsets[i] - 1
+        entries.append((tile_id, offset, lengths[i], run_lengths[i]))
+    return entries
+
+
+def _build_directories(entries: list) -> Tuple[bytes, bytes]:
+    """
+    Build the root directory and, when it would not fit in the first 16 KiB of the archive,
+    the leaf directories it points to.
+    """
+    root = _serialize_directory(entries)
+    if len(root) <= _PMTILES_ROOT_MAX_SIZE:
+        return root, b""
+
+    leaf_size = 4096
+    while True:
+        leaves = bytearray()
+        root_entries = []
+        for start in range(0, len(entries), leaf_size):
+            chunk = entries[start : start + leaf_size]
+            leaf = _serialize_directory(chunk)
+            # A run length of 0 points to a leaf directory
+            root_entries.append((chunk[0][0], len(leaves), len(leaf), 0))
+            leaves += leaf
+        root = _serialize_directory(root_entries)
+        if len(root) <= _PMTILES_ROOT_MAX_SIZE:
+            return root, bytes(leaves)
+        leaf_size *= 2
+
+
+def write_pmtiles(source: MBTilesArchive, path: Path, metadata: dict):
+    """
+    Convert an MBTiles archive into a PMTiles archive.
+
+    Tiles are written in tile ID order and every distinct tile once; runs of consecutive
+    identical tiles (e.g. fully opaque areas) share a single directory entry.
+
+    Args:
+        source (MBTilesArchive): The tiles.
+        path (Path): The ``.pmtiles`` file.
+        metadata (dict): JSON metadata. ``bounds`` (west, south, east, north), ``minzoom``
+            and ``maxzoom`` are also written to the header.
+    """
+    rows = source.conn.execute("SELECT zoom_level, tile_column, tile_row, tile_id FROM map")
+    tiles = sorted((zxy_to_tileid(z, x, (1 << z) - 1 - row), digest) for z, x, row, digest in rows)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entries = []
+    offsets = {}
+    with tempfile.TemporaryFile(dir=path.parent) as tile_data:
+        for tile_id, digest in tiles:
+            if digest not in offsets:
+                (data,) = source.conn.execute(
+                    "SELECT tile_data FROM images WHERE tile_id = ?", (digest,)
+                ).fetchone()
+                offsets[digest] = (tile_data.tell(), len(data))
+                tile_data.write(data)
+            offset, length = offsets[digest]
+
+            last = entries[-1] if entries else None
+            if last and last[1] == offset and last[0] + last[3] == tile_id:
+                entries[-1] = (last[0], offset, length, last[3] + 1)
+            else:
+                entries.append((tile_id, offset, length, 1))
+        tile_data_length = tile_data.tell()
+
+        root, leaves = _build_directories(entries)
+        meta = gzip.compress(json.dumps(metadata).encode(), mtime=0)
+        west, south, east, north = metadata.get("bounds", (-180, -85.0511, 180, 85.0511))
+        min_z = int(metadata.get("minzoom", 0))
+        max_z = int(metadata.get("maxzoom", 0))
+
+        root_offset = _PMTILES_HEADER_SIZE
+        meta_offset = root_offset + len(root)
+        leaves_offset = meta_offset + len(meta)
+        data_offset = leaves_offset + len(leaves)
+        header = struct.pack(
+            "<7sB8Q3Q4B2B4iB2i",
+            b"PMTiles",
+            3,
+            root_offset,
+            len(root),
+            meta_offset,
+            len(meta),
+            leaves_offset,
+            len(leaves),
+            data_offset,
+            tile_data_length,
+            len(tiles),
+            len(entries),
+            len(offsets),
+            1,  # clustered
+            _PMTILES_COMPRESSION_GZIP,
+            _PMTILES_COMPRESSION_NONE,
+            _PMTILES_TILE_TYPE_PNG,
+            min_z,
+            max_z,
+            *(round(v * 1e7) for v in (west, south, east, north)),
+            min_z,
+            round((west + east) / 2 * 1e7),
+            round((south + north) / 2 * 1e7),
+        )
+
+        with open(path, "wb") as f:
+            f.write(header + root + meta + leaves)
+            tile_data.seek(0)
+            while chunk := tile_data.read(1 << 20):
+                f.write(chunk)
+
+
+def read_pmtiles(path: Path) -> Iterator[Tuple[mercantile.Tile, bytes]]:
+    """
+    Iterate over every tile of a PMTiles archive and its data.
+    """
+    with open(path, "rb") as f:
+        header = f.read(_PMTILES_HEADER_SIZE)
+        magic, version, root_offset, root_length, _, _, leaves_offset, _, data_offset = (
+            struct.unpack_from("<7sB7Q", header)
+        )
+        if magic != b"PMTiles" or version != 3:
+            raise ValueError(f"Not a PMTiles v3 archive: {path}")
+        internal_compression = header[97]
+        if internal_compression != _PMTILES_COMPRESSION_GZIP:
+            raise ValueError(f"Unsupported PMTiles directory compression: {internal_compression}")
+
+        def read(offset: int, length: int) -> bytes:
+            f.seek(offset)
+            return f.read(length)
+
+        directories = [read(root_offset, root_length)]
+        while directories:
+            for tile_id, offset, length, run_length in _deserialize_directory(directories.pop()):
+                if run_length == 0:
+                    directories.append(read(leaves_offset + offset, length))
+                    continue
+                data = read(data_offset + offset, length)
+                for i in range(run_length):
+                    yield tileid_to_zxy(tile_id + i), data
+
+
+def read_archive(path: Path) -> Iterator[Tuple[mercantile.Tile, bytes]]:
+    """
+    Iterate over every tile of an MBTiles or PMTiles archive and its data.
+    """
+    path = Path(path)
+    if path.suffix == ".pmtiles":
+        yield from read_pmtiles(path)
+        return
+
+    archive = MBTilesArchive(path)
+    try:
+        yield from archive.tiles()
+    finally:
+        archive.close()
+
+
+def pack_tiles(tile_dir: Path, path: Path, metadata: Optional[dict] = None) -> int:
+    """
+    Pack a ``{z}/{x}/{y}.png`` tile folder into an MBTiles or PMTiles archive.
+
+    Args:
+        tile_dir (Path): The tile folder.
+        path (Path): The archive, ``.mbtiles`` or ``.pmtiles``.
+        metadata (dict, optional): Archive metadata. Defaults to the name and zoom range.
+
+    Returns:
+        int: The number of tiles packed.
+    """
+    tile_dir, path = Path(tile_dir), Path(path)
+    if path.suffix not in (".mbtiles", ".pmtiles"):
+        raise ValueError(f"Unsupported archive format: {path.suffix}")
+
+    tiles = [
+        mercantile.Tile(int(p.parent.name), int(p.stem), int(p.parent.parent.name))
+        for p in tile_dir.glob("*/*/*.png")
+        # Only APNGs, not frames left by an unfinished run
+        if p.stem.isdigit()
+    ]
+    if metadata is None:
+        zooms = [tile.z for tile in tiles] or [0]
+        metadata = {"name": tile_dir.name, "format": "png"}
+        metadata.update(minzoom=min(zooms), maxzoom=max(zooms))
+
+    staging = path if path.suffix == ".mbtiles" else path.with_suffix(".pmtiles.mbtiles")
+    staging.unlink(missing_ok=True)
+    archive = MBTilesArchive(staging)
+    for start in range(0, len(tiles), 1000):
+        archive.put_tiles(
+            (tile, (tile_dir / str(tile.z) / str(tile.x) / f"{tile.y}.png").read_bytes())
+            for tile in tiles[start : start + 1000]
+        )
+    archive.finish(metadata)
+
+    if staging != path:
+        write_pmtiles(archive, path, metadata)
+        archive.close()
+        staging.unlink()
+    return len(tiles)
+
+
+def extract_tiles(path: Path, tile_dir: Path) -> int:
+    """
+    Extract an MBTiles or PMTiles archive into a ``{z}/{x}/{y}.png`` tile folder.
+
+    Args:
+        path (Path): The archive.
+        tile_dir (Path): The tile folder, created if needed.
+
+    Returns:
+        int: The number of tiles extracted.
+    """
+    count = 0
+    for tile, data in read_archive(path):
+        tile_path = Path(tile_dir, str(tile.z), str(tile.x), f"{tile.y}.png")
+        tile_path.parent.mkdir(parents=True, exist_ok=True)
+        tile_path.write_bytes(data)
+        count += 1
+    return count
+
+
+def main():
+    """
+    Pack a tile folder into an archive, or extract an archive into a tile folder.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack", help="Pack a tile folder into an archive")
+    pack.add_argument("tile_dir", type=Path)
+    pack.add_argument("archive", type=Path)
+    extract = commands.add_parser("extract", help="Extract an archive into a tile folder")
+    extract.add_argument("archive", type=Path)
+    extract.add_argument("tile_dir", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        count = pack_tiles(args.tile_dir, args.archive)
+    else:
+        count = extract_tiles(args.archive, args.tile_dir)
+    print(f"{count} tiles {args.command}ed")
+
+
+if __name__ == "__main__":
+    main()
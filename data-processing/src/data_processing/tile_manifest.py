@@ -0,0 +1,189 @@
+"""
+Persistent record of the animated tiles already generated, used to resume interrupted runs.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Iterable, List
+
+import mercantile
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS frames (
+    frame INTEGER PRIMARY KEY, source TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tiles (z INTEGER, x INTEGER, y INTEGER, PRIMARY KEY (z, x, y));
+"""
+
+
+def file_signature(path: str) -> str:
+    """
+    Identify a source file by its path, size and modification time.
+    """
+    stat = os.stat(path)
+    return json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+
+
+def params_key(params: dict) -> str:
+    """
+    Hash the rendering parameters (colormap, value range, zoom levels...) of a run.
+    """
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class TileManifest:
+    """
+    SQLite manifest of an output folder, stored next to it as ``{output_folder}.manifest.sqlite``.
+
+    It records the rendering parameters and the signature of every source frame, the frames
+    whose tiles have all been written (frame-major mode) and the finished APNGs (tile-major
+    mode). When the parameters change every tile is stale; when a frame changes every APNG
+    is stale, since each one holds all the frames.
+    """
+
+    def __init__(self, output_folder: Path):
+        """
+        Initialize the TileManifest class. The database is created on first use.
+
+        Args:
+            output_folder (Path): The folder the animated tiles are written to.
+        """
+        output_folder = Path(output_folder)
+        self.output_folder = output_folder
+        self.path = output_folder.parent / f"{output_folder.name}.manifest.sqlite"
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        The SQLite connection, opened on first use.
+        """
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def __getstate__(self):
+        """
+        Drop the connection when pickled: it can't be, and workers never use the manifest.
+        """
+        return {"output_folder": self.output_folder, "path": self.path, "_conn": None}
+
+    def close(self):
+        """
+        Close the SQLite connection.
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _get(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def begin(
+        self, params: str, sources: List[str], force: bool = False, output: Path = None
+    ) -> bool:
+        """
+        Compare a new run with the recorded one and forget the work that is stale.
+
+        Args:
+            params (str): Key of the rendering parameters, see ``params_key``.
+            sources (list): Signature of every source frame, in frame order.
+            force (bool): Forget all recorded work and regenerate everything.
+            output (Path, optional): Where the recorded work is stored, if not in the output
+                folder (e.g. a tile archive). Everything is regenerated if it doesn't exist.
+
+        Returns:
+            bool: Whether recorded work was forgotten.
+        """
+        output = Path(output) if output else self.output_folder
+        with self.conn:
+            recorded = self.conn.execute("SELECT frame, source FROM frames").fetchall()
+            forgotten = True
+            if (
+                force
+                or self._get("params") != params
+                or len(recorded) != len(sources)
+                or not output.exists()
+            ):
+                self.conn.execute("DELETE FROM frames")
+                self.conn.execute("DELETE FROM tiles")
+                self._set("complete", "0")
+            elif any(source != sources[n] for n, source in recorded):
+                stale = [n for n, source in recorded if source != sources[n]]
+                self.conn.executemany(
+                    "UPDATE frames SET done = 0 WHERE frame = ?", [(n,) for n in stale]
+                )
+                self.conn.execute("DELETE FROM tiles")
+                self._set("complete", "0")
+            else:
+                forgotten = False
+
+            self._set("params", params)
+            self.conn.executemany(
+                "INSERT INTO frames (frame, source) VALUES (?, ?) "
+                "ON CONFLICT (frame) DO UPDATE SET source = excluded.source",
+                list(enumerate(sources)),
+            )
+        return forgotten
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether every tile of the run is up to date.
+        """
+        return self._get("complete") == "1"
+
+    def pending_frames(self) -> List[int]:
+        """
+        Frames whose tiles still have to be written in frame-major mode.
+
+        A complete run has assembled its frames into APNGs, so all of them are pending again
+        once anything is stale.
+        """
+        rows = self.conn.execute("SELECT frame FROM frames WHERE done = 0 ORDER BY frame")
+        return [frame for (frame,) in rows]
+
+    def pending_tiles(self, tiles: Iterable[mercantile.Tile]) -> List[mercantile.Tile]:
+        """
+        The tiles without a finished APNG, in their original order.
+        """
+        done = set(self.conn.execute("SELECT z, x, y FROM tiles"))
+        return [tile for tile in tiles if (tile.z, tile.x, tile.y) not in done]
+
+    def add_frames(self, frames: Iterable[int]):
+        """
+        Record frames whose tiles have all been written.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE frames SET done = 1 WHERE frame = ?", [(n,) for n in frames]
+            )
+
+    def add_tiles(self, tiles: Iterable[mercantile.Tile]):
+        """
+        Record finished APNGs. The coordinates are stored as ints, numpy integers would be
+        stored as blobs that never match a tile again.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tiles VALUES (?, ?, ?)",
+                [(int(tile.z), int(tile.x), int(tile.y)) for tile in tiles],
+            )
+
+    def finish(self):
+        """
+        Mark the run as complete. Frame-major frames have been consumed by the APNGs.
+        """
+        with self.conn:
+            self.conn.execute("UPDATE frames SET done = 0")
+            self._set("complete", "1")
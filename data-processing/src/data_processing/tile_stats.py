@@ -0,0 +1,131 @@
+"""
+Counters and per-stage timings of an animated tile run, reported as JSON per layer.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+# Stages timed for every tile frame or tile
+STAGES = ("read", "render", "encode", "downsample", "write", "assemble")
+
+# Tile frames read and what became of them, and APNG tiles written
+COUNTERS = ("attempted", "out_of_bounds", "failed", "empty", "rendered", "written")
+
+# Durations are binned logarithmically from 1 µs to 1000 s, so percentiles are within ~6%
+# and stats from many workers merge by adding their histograms
+_BINS_PER_DECADE = 20
+_MIN_SECONDS = 1e-6
+_NUM_BINS = 9 * _BINS_PER_DECADE + 1
+
+_local = threading.local()
+
+
+class TileStats:
+    """
+    Counters and stage duration histograms of the tiles rendered by a worker or a run.
+    """
+
+    def __init__(self):
+        """
+        Initialize the TileStats class with every counter at 0 and no durations.
+        """
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.totals = {}
+        self.maxima = {}
+        self.histograms = {}
+
+    def count(self, counter: str, n: int = 1):
+        """
+        Add ``n`` to a counter.
+        """
+        self.counts[counter] += n
+
+    def add_time(self, stage: str, seconds: float):
+        """
+        Record one duration of a stage.
+        """
+        if stage not in self.histograms:
+            self.histograms[stage] = np.zeros(_NUM_BINS, dtype=np.int64)
+            self.totals[stage] = 0.0
+            self.maxima[stage] = 0.0
+        position = math.log10(max(seconds, _MIN_SECONDS) / _MIN_SECONDS) * _BINS_PER_DECADE
+        self.histograms[stage][min(int(position), _NUM_BINS - 1)] += 1
+        self.totals[stage] += seconds
+        self.maxima[stage] = max(self.maxima[stage], seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        """
+        Record the duration of the ``with`` block as one duration of a stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def merge(self, other: "TileStats"):
+        """
+        Add the counters and durations of another TileStats.
+        """
+        for counter, n in other.counts.items():
+            self.counts[counter] += n
+        for stage, histogram in other.histograms.items():
+            if stage not in self.histograms:
+                self.histograms[stage] = np.zeros(_NUM_BINS, dtype=np.int64)
+                self.totals[stage] = 0.0
+                self.maxima[stage] = 0.0
+            self.histograms[stage] += histogram
+            self.totals[stage] += other.totals[stage]
+            self.maxima[stage] = max(self.maxima[stage], other.maxima[stage])
+
+    def _percentile(self, stage: str, q: float) -> float:
+        # Geometric middle of the bin holding the q-th duration
+        cumulative = np.cumsum(self.histograms[stage])
+        index = int(np.searchsorted(cumulative, q * cumulative[-1]))
+        seconds = _MIN_SECONDS * 10 ** ((index + 0.5) / _BINS_PER_DECADE)
+        return min(seconds, self.maxima[stage])
+
+    def to_dict(self) -> dict:
+        """
+        The counters, and the number, total, mean, 50th/90th/99th percentile and maximum of
+        the durations of every stage, in seconds.
+        """
+        stages = {}
+        for stage in sorted(self.histograms, key=STAGES.index):
+            count = int(self.histograms[stage].sum())
+            stages[stage] = {
+                "count": count,
+                "total": self.totals[stage],
+                "mean": self.totals[stage] / count,
+                "p50": self._percentile(stage, 0.5),
+                "p90": self._percentile(stage, 0.9),
+                "p99": self._percentile(stage, 0.99),
+                "max": self.maxima[stage],
+            }
+        return {"counts": dict(self.counts), "stages": stages}
+
+
+@contextmanager
+def recording(stats: TileStats):
+    """
+    Make ``stats`` the calling thread's recorder (see ``current``) inside the ``with`` block.
+    """
+    previous = getattr(_local, "stats", None)
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+def current() -> Optional[TileStats]:
+    """
+    The calling thread's recorder, if it is inside a ``recording`` block.
+    """
+    return getattr(_local, "stats", None)
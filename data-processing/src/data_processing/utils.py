@@ -4,109 +4,452 @@ clipping rasters by vector files, merging TIFFs, resampling rasters, converting
 and reprojecting rasters.
 """
 
+import hashlib
+import io
 import json
+import multiprocessing
 import os
 import re
+import struct
 import subprocess
 import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from glob import glob
 from pathlib import Path
 from typing import Dict, List, Tuple
 
 import geopandas as gpd
 import matplotlib
+import mercantile
 import numpy as np
 import pandas as pd
 import rasterio
 import rasterio.mask
-from apng import APNG
+from PIL import Image
 from rasterio.mask import mask
 from rasterio.merge import merge
 from rasterio.warp import Resampling, calculate_default_transform, reproject
 from rasterio.windows import Window
 
+from .tile_stats import TileStats
+from .worker_budget import BudgetShare, bounded_map
 
-def create_apngs(tile_dir: Path):
+# Name of the manifest of identical tiles written to the tile folder by dedupe_tiles
+DEDUPE_MANIFEST = "dedupe_manifest.json"
+
+
+# PNG chunks that must come before the image data, taken from the first frame of an APNG
+_CHUNKS_BEFORE_IDAT = {
+    b"PLTE", b"tRNS", b"cHRM", b"gAMA", b"iCCP", b"sBIT", b"sRGB", b"bKGD", b"hIST", b"pHYs",
+    b"sPLT", b"tIME",
+}  # fmt: skip
+
+
+def _png_chunks(data: bytes) -> list:
+    """
+    Split PNG bytes into (type, payload) chunks.
+    """
+    chunks = []
+    i = 8
+    while i < len(data):
+        (length,) = struct.unpack("!I", data[i : i + 4])
+        chunks.append((data[i + 4 : i + 8], data[i + 8 : i + 8 + length]))
+        i += length + 12
+    return chunks
+
+
+def _make_chunk(chunk_type: bytes, payload: bytes) -> bytes:
+    return (
+        struct.pack("!I", len(payload))
+        + chunk_type
+        + payload
+        + struct.pack("!I", zlib.crc32(chunk_type + payload))
+    )
+
+
+def encode_apng(frames: List[bytes], offsets: List[Tuple[int, int]] = None, delta=False) -> bytes:
+    """
+    Write an APNG from PNG frames by copying their compressed image data into APNG chunks,
+    without decoding or recompressing them. The output is the same as the ``apng`` library's.
+
+    Args:
+        frames (list): PNG bytes of every frame. They must share the first frame's color type
+            and palette.
+        offsets (list, optional): (x, y) offset of every frame. Defaults to (0, 0).
+        delta (bool): Draw the frames over the previous ones (dispose op NONE, blend op
+            SOURCE) instead of clearing them after they are shown (dispose op BACKGROUND).
+
+    Returns:
+        bytes: The APNG.
+    """
+    dispose_op = 0 if delta else 1
+    out = [b"\x89PNG\r\n\x1a\n"]
+    trailing = []
+    seq = 0
+
+    for n, frame in enumerate(frames):
+        chunks = _png_chunks(frame)
+        header = next(payload for chunk_type, payload in chunks if chunk_type == b"IHDR")
+        width, height = struct.unpack("!II", header[:8])
+        x_offset, y_offset = offsets[n] if offsets else (0, 0)
+        control = struct.pack(
+            "!IIIIHHbb", width, height, x_offset, y_offset, 1, 1000, dispose_op, 0
+        )
+
+        if n == 0:
+            out.append(_make_chunk(b"IHDR", header))
+            out.append(_make_chunk(b"acTL", struct.pack("!II", len(frames), 0)))
+        out.append(_make_chunk(b"fcTL", struct.pack("!I", seq) + control))
+        seq += 1
+
+        image_data = []
+        for chunk_type, payload in chunks:
+            if chunk_type in (b"IHDR", b"IEND"):
+                continue
+            if chunk_type == b"IDAT":
+                if n == 0:
+                    image_data.append(_make_chunk(b"IDAT", payload))
+                else:
+                    image_data.append(_make_chunk(b"fdAT", struct.pack("!I", seq) + payload))
+                    seq += 1
+            elif n == 0:
+                out.append(_make_chunk(chunk_type, payload))
+            elif chunk_type not in _CHUNKS_BEFORE_IDAT:
+                trailing.append(_make_chunk(chunk_type, payload))
+        out.extend(image_data)
+
+    out.extend(trailing)
+    out.append(_make_chunk(b"IEND", b""))
+    return b"".join(out)
+
+
+def build_apng(frames: List[bytes], delta: bool = False) -> bytes:
+    """
+    Assemble PNG frames into an APNG with one frame per time step.
+
+    Args:
+        frames (list): PNG bytes of every frame, all the same size.
+        delta (bool): Store only the rectangle that changed since the previous frame, drawn
+            over it (dispose op NONE, blend op SOURCE). An unchanged frame is stored as a
+            single pixel, so the frame count is kept. Otherwise every frame is stored whole.
+
+    Returns:
+        bytes: The APNG.
+    """
+    if not delta:
+        return encode_apng(frames)
+
+    patches = []
+    offsets = []
+    previous = None
+    for frame in frames:
+        source = Image.open(io.BytesIO(frame))
+        # Palette frames share the palette of the layer, so they are compared by index
+        mode = "P" if source.mode == "P" else "RGBA"
+        image = np.asarray(source if mode == "P" else source.convert("RGBA"))
+        if previous is None:
+            top, left, bottom, right = 0, 0, *image.shape[:2]
+        else:
+            changed = (image != previous).reshape(*image.shape[:2], -1).any(axis=2)
+            rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            if rows.size:
+                top, left, bottom, right = rows[0], cols[0], rows[-1] + 1, cols[-1] + 1
+            else:
+                # Nothing changed: redraw one pixel of the previous frame
+                top, left, bottom, right = 0, 0, 1, 1
+
+        # Every frame is encoded in the same mode so they all match the header of the first one
+        out = io.BytesIO()
+        patch = Image.fromarray(image[top:bottom, left:right], mode)
+        if mode == "P":
+            patch.putpalette(source.getpalette())
+            patch.save(out, "PNG", transparency=source.info.get("transparency"))
+        else:
+            patch.save(out, "PNG")
+        patches.append(out.getvalue())
+        offsets.append((int(left), int(top)))
+        previous = image
+
+    return encode_apng(patches, offsets, delta=True)
+
+
+def _frame_number(path: str) -> int:
+    return int(Path(path).stem.split("_")[1])
+
+
+def _tile_frames(tile_dir: Path) -> list:
+    """
+    Find the frame files of every tile, grouped by z/x column.
+
+    Returns:
+        list: One list per column of (APNG path, frame paths sorted by frame number).
+    """
+    columns = []
+    for z_dir in os.scandir(tile_dir):
+        if not z_dir.is_dir():
+            continue
+        for x_dir in os.scandir(z_dir.path):
+            tiles = {}
+            for entry in os.scandir(x_dir.path):
+                # Only the {y}_{NNN}.png frames, not APNGs assembled by a previous run
+                if "_" in entry.name:
+                    tiles.setdefault(entry.name.split("_")[0], []).append(entry.path)
+            if tiles:
+                columns.append(
+                    [
+                        (os.path.join(x_dir.path, f"{y}.png"), sorted(paths, key=_frame_number))
+                        for y, paths in tiles.items()
+                    ]
+                )
+    return columns
+
+
+def _assemble_apngs(
+    column: list,
+    num_frames: int = None,
+    blank_frame: bytes = None,
+    delta: bool = False,
+    archive=None,
+) -> tuple:
+    """
+    Assemble and write the APNGs of one z/x column, then remove their frames.
+
+    The APNGs are written to ``archive`` (a ``tile_archive.MBTilesArchive``) if given, in
+    one transaction per column, instead of next to their frames.
+
+    Returns:
+        tuple: Seconds spent reading, encoding, writing and removing files, and tiles written;
+            and the per-tile ``assemble`` and ``write`` timings as a ``TileStats``.
+    """
+    timings = dict.fromkeys(("read", "encode", "write", "remove"), 0.0)
+    stats = TileStats()
+    apngs = []
+    for apng_path, png_files in column:
+        start = time.perf_counter()
+        if num_frames and blank_frame:
+            frames = {_frame_number(x): x for x in png_files}
+            frames = [
+                Path(frames[n]).read_bytes() if n in frames else blank_frame
+                for n in range(num_frames)
+            ]
+        else:
+            frames = [Path(x).read_bytes() for x in png_files]
+        read = time.perf_counter()
+        apng = build_apng(frames, delta)
+        encode = time.perf_counter()
+        if archive is None:
+            Path(apng_path).write_bytes(apng)
+            write = time.perf_counter()
+            for file in png_files:
+                os.remove(file)
+        else:
+            z, x, y = Path(apng_path).with_suffix("").parts[-3:]
+            apngs.append((mercantile.Tile(int(x), int(y), int(z)), apng))
+            write = time.perf_counter()
+
+        timings["read"] += read - start
+        timings["encode"] += encode - read
+        timings["write"] += write - encode
+        timings["remove"] += time.perf_counter() - write
+        stats.add_time("assemble", encode - start)
+        if archive is None:
+            stats.add_time("write", write - encode)
+
+    if archive is not None:
+        # Frames are only removed once their APNGs are safely in the archive
+        start = time.perf_counter()
+        archive.put_tiles(apngs)
+        write = time.perf_counter()
+        for _, png_files in column:
+            for file in png_files:
+                os.remove(file)
+        timings["write"] += write - start
+        timings["remove"] += time.perf_counter() - write
+        stats.add_time("write", write - start)
+    timings["tiles"] = len(column)
+    stats.count("written", len(column))
+    return timings, stats
+
+
+def create_apngs(
+    tile_dir: Path,
+    num_frames: int = None,
+    blank_frame: bytes = None,
+    delta: bool = False,
+    max_workers: int = None,
+    archive=None,
+    stats: TileStats = None,
+    budget: BudgetShare = None,
+) -> dict:
     """
     Create APNGs from the tiles.
 
+    The frames ``{z}/{x}/{y}_{NNN}.png`` of every tile are assembled into ``{z}/{x}/{y}.png``
+    and removed. Columns of tiles are assembled in parallel over a process pool.
+
     Attributes:
         tile_dir (str): The name of the local folder where the animated tiles will be exported.
+        num_frames (int, optional): Total number of frames. When given with ``blank_frame``,
+            frames missing from a tile (skipped because they had no data) are filled in so
+            every APNG keeps one frame per time step.
+        blank_frame (bytes, optional): PNG bytes of a fully transparent frame.
+        delta (bool, optional): Store only what changed between frames, see ``build_apng``.
+        max_workers (int, optional): Number of processes. Defaults to the number of CPUs.
+        archive (tile_archive.MBTilesArchive, optional): Write the APNGs into this archive
+            instead of ``{z}/{x}/{y}.png`` files.
+        stats (TileStats, optional): Add the per-tile assembly and write timings to it.
+        budget (BudgetShare, optional): Worker budget shared with the layers processed
+            concurrently. Every column waits for a slot of it, and ``max_workers`` defaults to
+            the size of the budget.
+
+    Returns:
+        dict: Number of tiles, wall-clock seconds of the ``scan`` and ``assemble`` stages, and
+            seconds spent in the ``read``, ``encode``, ``write`` and ``remove`` steps summed
+            over the workers.
     """
-    for z_dir in os.listdir(tile_dir):
-        for x_dir in os.listdir(os.path.join(tile_dir, z_dir)):
-            file_names = os.listdir(os.path.join(tile_dir, z_dir, x_dir))
+    start = time.perf_counter()
+    columns = _tile_frames(tile_dir)
+    scanned = time.perf_counter()
+
+    timings = dict.fromkeys(("read", "encode", "write", "remove"), 0.0)
+    timings["tiles"] = 0
+    assemble = partial(
+        _assemble_apngs,
+        num_frames=num_frames,
+        blank_frame=blank_frame,
+        delta=delta,
+        archive=archive,
+    )
+    if budget is not None:
+        max_workers = max_workers or budget.workers
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        if budget is None:
+            results = executor.map(assemble, columns, chunksize=16)
+        else:
+            results = bounded_map(executor, assemble, columns, 4 * max_workers, budget)
+        for column_timings, column_stats in results:
+            for key, value in column_timings.items():
+                timings[key] += value
+            if stats is not None:
+                stats.merge(column_stats)
+
+    timings["scan"] = scanned - start
+    timings["assemble"] = time.perf_counter() - scanned
+    return timings
+
+
+def dedupe_tiles(tile_dir: Path) -> dict:
+    """
+    Find byte-identical tiles and write a manifest so they can be stored once.
 
-            tiles = [x.split("_")[0] for x in file_names]
-            tiles = list(set(tiles))
-            for tile in tiles:
-                png_files = list(filter(lambda x: x.split("_")[0] == tile, file_names))
-                png_files = sorted(png_files, key=lambda x: float(x.split(".")[0]))
-                png_files = [os.path.join(tile_dir, z_dir, x_dir, i) for i in png_files]
-                # Create APNG
-                APNG.from_files(png_files, delay=1).save(png_files[0][:-8] + ".png")
-                # Remove PNGs
-                [os.remove(file) for file in png_files]
+    The manifest (``dedupe_manifest.json`` in ``tile_dir``) maps every duplicate tile path to
+    the first identical tile, e.g. ``{"8/150/90.png": "8/150/89.png"}``.
 
+    Args:
+        tile_dir (Path): The folder containing the ``{z}/{x}/{y}.png`` tiles.
 
-def get_files_with_years(input_folder, date_format="DDMMYYYY"):
+    Returns:
+        dict: The manifest, with the number of tiles, unique tiles and bytes saved.
     """
-    Get a list of all files in the directory sorted by date.
-    Handles different date formats based on the specified format.
+    tile_dir = Path(tile_dir)
+    first_by_hash = {}
+    duplicates = {}
+    num_tiles = 0
+    bytes_saved = 0
+
+    for path in sorted(tile_dir.glob("*/*/*.png")):
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        tile = path.relative_to(tile_dir).as_posix()
+        num_tiles += 1
+
+        if digest in first_by_hash:
+            duplicates[tile] = first_by_hash[digest]
+            bytes_saved += len(data)
+        else:
+            first_by_hash[digest] = tile
+
+    manifest = {
+        "tiles": num_tiles,
+        "unique": len(first_by_hash),
+        "bytes_saved": bytes_saved,
+        "duplicates": duplicates,
+    }
+    with open(tile_dir / DEDUPE_MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def parse_frame_date(filename, date_format="DDMMYYYY"):
+    """
+    Find the date of a frame in its filename, normalized to a YYYYMMDD integer.
     Finds date patterns anywhere in the filename. If multiple patterns exist,
     takes the first one found.
 
     Args:
-        input_folder (str): Path to the folder containing files
+        filename (str): The name of the file
         date_format (str): Expected date format. Options: "DDMMYYYY" or "YYYYMMDD"
-    """
-    files = os.listdir(input_folder)
-    files_with_dates = []
-
-    for f in files:
-        # Pattern 1: 8 digits - highest priority
-        match_8 = re.search(r"_(\d{8})", f)
-        if match_8:
-            date_str = match_8.group(1)
-
-            if date_format == "YYYYMMDD":
-                # Already in YYYYMMDD format
-                normalized_date = int(date_str)
-            else:  # DDMMYYYY
-                # Convert DDMMYYYY to YYYYMMDD for sorting
-                dd = date_str[:2]
-                mm = date_str[2:4]
-                yyyy = date_str[4:]
-                normalized_date = int(yyyy + mm + dd)
-
-            files_with_dates.append((f, normalized_date))
-            continue
 
-        # Pattern 2: 6 digits - medium priority
-        match_6 = re.search(r"_(\d{6})", f)
-        if match_6:
-            date_str = match_6.group(1)
+    Returns:
+        int or None: The date, or None if the filename has no date
+    """
+    # Pattern 1: 8 digits - highest priority
+    match_8 = re.search(r"_(\d{8})", filename)
+    if match_8:
+        date_str = match_8.group(1)
+
+        if date_format == "YYYYMMDD":
+            # Already in YYYYMMDD format
+            return int(date_str)
+        # DDMMYYYY: convert to YYYYMMDD for sorting
+        dd = date_str[:2]
+        mm = date_str[2:4]
+        yyyy = date_str[4:]
+        return int(yyyy + mm + dd)
+
+    # Pattern 2: 6 digits - medium priority
+    match_6 = re.search(r"_(\d{6})", filename)
+    if match_6:
+        date_str = match_6.group(1)
+
+        if date_format == "YYYYMMDD":
+            # YYYYMM format - assume first day of month
+            return int(date_str + "01")
+        # DDMMYYYY: MMYYYY format - convert to YYYYMM01
+        mm = date_str[:2]
+        yyyy = date_str[2:]
+        return int(yyyy + mm + "01")
+
+    # Pattern 3: 4 digits - lowest priority
+    match_4 = re.search(r"_(\d{4})", filename)
+    if match_4:
+        # YYYY format - assume January 1st (same for both formats)
+        return int(match_4.group(1) + "0101")
+
+    return None
 
-            if date_format == "YYYYMMDD":
-                # YYYYMM format - assume first day of month
-                normalized_date = int(date_str + "01")
-            else:  # DDMMYYYY
-                # MMYYYY format - convert to YYYYMM01
-                mm = date_str[:2]
-                yyyy = date_str[2:]
-                normalized_date = int(yyyy + mm + "01")
 
-            files_with_dates.append((f, normalized_date))
-            continue
+def get_files_with_years(input_folder, date_format="DDMMYYYY"):
+    """
+    Get a list of all files in the directory sorted by date.
+    Handles different date formats based on the specified format,
+    see ``parse_frame_date``.
 
-        # Pattern 3: 4 digits - lowest priority
-        match_4 = re.search(r"_(\d{4})", f)
-        if match_4:
-            date_str = match_4.group(1)
-            # YYYY format - assume January 1st (same for both formats)
-            normalized_date = int(date_str + "0101")
+    Args:
+        input_folder (str): Path to the folder containing files
+        date_format (str): Expected date format. Options: "DDMMYYYY" or "YYYYMMDD"
+    """
+    files_with_dates = []
+    for f in os.listdir(input_folder):
+        normalized_date = parse_frame_date(f, date_format)
+        if normalized_date is not None:
             files_with_dates.append((f, normalized_date))
-            continue
 
     sorted_files = sorted(files_with_dates, key=lambda x: x[1])
     return sorted_files
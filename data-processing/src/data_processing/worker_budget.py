@@ -0,0 +1,150 @@
+"""
+A global number of tile workers shared fairly by the animated layers processed concurrently,
+and the bounded task queue feeding them.
+"""
+
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+
+
+class WorkerBudget:
+    """
+    Slots for at most ``workers`` tasks running at once, over every layer.
+
+    A freed slot goes to the waiting layer that holds the fewest slots, so a layer with
+    thousands of tiles queued only gets more than its share of the workers while the other
+    layers have nothing waiting.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Initialize the WorkerBudget class.
+
+        Args:
+            workers (int, optional): Number of slots. Defaults to the number of CPUs.
+        """
+        self.workers = workers or os.cpu_count()
+        self._condition = threading.Condition()
+        self._held = defaultdict(int)
+        self._waiting = defaultdict(int)
+
+    def _is_turn(self, layer: str) -> bool:
+        if sum(self._held.values()) >= self.workers:
+            return False
+        return self._held[layer] == min(
+            self._held[other] for other, waiting in self._waiting.items() if waiting
+        )
+
+    def acquire(self, layer: str):
+        """
+        Wait for a free slot and take it for ``layer``.
+        """
+        with self._condition:
+            self._waiting[layer] += 1
+            try:
+                self._condition.wait_for(lambda: self._is_turn(layer))
+            finally:
+                self._waiting[layer] -= 1
+            self._held[layer] += 1
+
+    def release(self, layer: str):
+        """
+        Give back a slot taken for ``layer``.
+        """
+        with self._condition:
+            self._held[layer] -= 1
+            self._condition.notify_all()
+
+    def share(self, layer: str) -> "BudgetShare":
+        """
+        The view of the budget a layer's engine works with.
+        """
+        return BudgetShare(self, layer)
+
+
+class BudgetShare:
+    """
+    The slots of a ``WorkerBudget`` taken by one layer.
+    """
+
+    def __init__(self, budget: WorkerBudget, layer: str):
+        """
+        Initialize the BudgetShare class.
+        """
+        self.budget = budget
+        self.layer = layer
+
+    @property
+    def workers(self) -> int:
+        """
+        Number of slots of the whole budget, the most this layer can get.
+        """
+        return self.budget.workers
+
+    def acquire(self):
+        """
+        Wait for a free slot and take it.
+        """
+        self.budget.acquire(self.layer)
+
+    def release(self):
+        """
+        Give back a slot.
+        """
+        self.budget.release(self.layer)
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold a slot inside the ``with`` block.
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def bounded_map(
+    executor: Executor,
+    fn: Callable,
+    items: Iterable,
+    max_pending: int,
+    budget: Optional[BudgetShare] = None,
+) -> Iterator:
+    """
+    Like ``executor.map``, but ``items`` is consumed lazily and at most ``max_pending`` tasks
+    are queued or running at once, so a generator of any length can feed a long-lived
+    executor with flat memory. Results are yielded in order. Works with thread and process
+    pools alike.
+
+    Args:
+        executor (Executor): The pool running the tasks.
+        fn (callable): The task, called with one item.
+        items (iterable): The task arguments, e.g. a generator.
+        max_pending (int): Most tasks submitted and not yet yielded.
+        budget (BudgetShare, optional): Submit every task only once a slot of this share of
+            a worker budget is free, and hold the slot until the task is done.
+    """
+    pending = deque()
+    for item in items:
+        # Hand over the results already in, and wait for room in the queue
+        while pending and (len(pending) >= max_pending or pending[0].done()):
+            yield pending.popleft().result()
+        if budget is not None:
+            budget.acquire()
+        try:
+            future = executor.submit(fn, item)
+        except BaseException:
+            if budget is not None:
+                budget.release()
+            raise
+        if budget is not None:
+            future.add_done_callback(lambda _: budget.release())
+        pending.append(future)
+    while pending:
+        yield pending.popleft().result()
@@ -2,8 +2,17 @@
 A module to convert GeoTIFF files to Cloud-Optimized GeoTIFF (COG) format.
 """
 
+import hashlib
+import multiprocessing
+import os
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import List
+
+from rio_cogeo.cogeo import cog_translate
+from rio_cogeo.profiles import cog_profiles
 
 
 class COGConverter:
@@ -44,3 +53,74 @@ class COGConverter:
             subprocess.run(command, check=True)
         except subprocess.CalledProcessError as e:
             print(f"Error converting GeoTIFF to COG: {e}")
+
+
+def cached_cog(geotiff_path: Path, cache_dir: Path, overview_resampling: str = "nearest") -> Path:
+    """
+    Convert a GeoTIFF file to a tiled COG with overviews, unless it was already converted.
+
+    The COG keeps the CRS, resolution and values of the source; it is named after the
+    overview resampling and the SHA-256 of the source content and the conversion options, so
+    renamed or re-clipped copies of the same file reuse it.
+
+    Args:
+        geotiff_path (Path): The path to the GeoTIFF file.
+        cache_dir (Path): The folder where the COGs are kept.
+        overview_resampling (str): Resampling method used to build the overviews.
+
+    Returns:
+        Path: The path of the COG.
+    """
+    with open(geotiff_path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256")
+    digest.update(overview_resampling.encode())
+    cog_path = Path(cache_dir) / f"{digest.hexdigest()[:32]}.{overview_resampling}.tif"
+    if cog_path.exists():
+        return cog_path
+
+    # Written under a temporary name so an interrupted conversion is never reused
+    cog_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cog_path.with_suffix(f".{os.getpid()}.tmp")
+    cog_translate(
+        str(geotiff_path),
+        str(tmp_path),
+        cog_profiles.get("deflate"),
+        overview_resampling=overview_resampling,
+        quiet=True,
+    )
+    os.replace(tmp_path, cog_path)
+    return cog_path
+
+
+def prepare_cogs(
+    geotiff_paths: List[Path],
+    cache_dir: Path,
+    overview_resampling: str = "nearest",
+    max_workers: int = None,
+) -> List[Path]:
+    """
+    Convert GeoTIFF files to COGs in parallel, reusing the COGs already in ``cache_dir``.
+
+    COGs made with the same overview resampling from files that are not in
+    ``geotiff_paths`` anymore are removed from the cache. COGs made with another resampling,
+    e.g. by another layer on the same inputs, and conversions in progress are left alone.
+
+    Args:
+        geotiff_paths (list of Path): The GeoTIFF files.
+        cache_dir (Path): The folder where the COGs are kept.
+        overview_resampling (str): Resampling method used to build the overviews.
+        max_workers (int, optional): Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        list of Path: The COG of every GeoTIFF file, in the same order.
+    """
+    convert = partial(cached_cog, cache_dir=cache_dir, overview_resampling=overview_resampling)
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        cog_paths = list(executor.map(convert, geotiff_paths))
+
+    for path in Path(cache_dir).glob(f"*.{overview_resampling}.tif"):
+        if path not in cog_paths:
+            path.unlink(missing_ok=True)
+    return cog_paths
@@ -0,0 +1,157 @@
+"""
+A module to pack the frames of an animated layer into a single multi-band GeoTIFF cube.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+
+# Internal tile size of the cube, and the size below which no more overviews are built
+CUBE_BLOCK_SIZE = 256
+
+
+def _check_aligned(srcs: list):
+    """
+    Raise a ValueError unless the frames share a single-band grid, dtype and nodata value.
+    """
+    first = srcs[0]
+    for src in srcs:
+        if src.count != 1:
+            raise ValueError(f"Frame cubes need single-band frames: {src.name}")
+        if (src.crs, src.transform, src.shape, src.dtypes[0]) != (
+            first.crs,
+            first.transform,
+            first.shape,
+            first.dtypes[0],
+        ):
+            raise ValueError(f"Frame not aligned with {first.name}: {src.name}")
+        if src.nodata != first.nodata and not (
+            src.nodata is not None
+            and first.nodata is not None
+            and np.isnan([src.nodata, first.nodata]).all()
+        ):
+            raise ValueError(f"Frame nodata differs from {first.name}: {src.name}")
+
+
+def build_frame_cube(
+    geotiff_paths: List[Path],
+    cube_path: Path,
+    overview_resampling: str = "nearest",
+) -> Path:
+    """
+    Write the frames as the bands of one tiled, pixel-interleaved GeoTIFF with overviews.
+
+    Band ``n + 1`` holds frame ``n``. As the frames of a pixel are stored next to each other,
+    reading a tile window of every band pulls each internal block once, instead of one
+    random read per frame file. The cube is written block by block, so memory stays flat.
+
+    Args:
+        geotiff_paths (list of Path): The frames, single-band GeoTIFFs on the same grid.
+        cube_path (Path): The path of the cube.
+        overview_resampling (str): Resampling method used to build the overviews.
+
+    Returns:
+        Path: The path of the cube.
+    """
+    srcs = [rasterio.open(path) for path in geotiff_paths]
+    try:
+        _check_aligned(srcs)
+        first = srcs[0]
+        profile = {
+            "driver": "GTiff",
+            "count": len(srcs),
+            "height": first.height,
+            "width": first.width,
+            "dtype": first.dtypes[0],
+            "crs": first.crs,
+            "transform": first.transform,
+            "nodata": first.nodata,
+            "tiled": True,
+            "blockxsize": CUBE_BLOCK_SIZE,
+            "blockysize": CUBE_BLOCK_SIZE,
+            "interleave": "pixel",
+            "compress": "deflate",
+            "BIGTIFF": "IF_SAFER",
+        }
+
+        # Written under a temporary name so an interrupted build is never reused
+        cube_path = Path(cube_path)
+        cube_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cube_path.with_suffix(f".{os.getpid()}.tmp")
+        with rasterio.open(tmp_path, "w", **profile) as dst:
+            for _, window in dst.block_windows(1):
+                dst.write(np.stack([src.read(1, window=window) for src in srcs]), window=window)
+            for n, path in enumerate(geotiff_paths):
+                dst.set_band_description(n + 1, Path(path).name)
+
+            factors = []
+            while min(first.height, first.width) // 2 ** (len(factors) + 1) >= CUBE_BLOCK_SIZE:
+                factors.append(2 ** (len(factors) + 1))
+            if factors:
+                dst.build_overviews(factors, Resampling[overview_resampling])
+                dst.update_tags(ns="rio_overview", resampling=overview_resampling)
+        os.replace(tmp_path, cube_path)
+        return cube_path
+    finally:
+        for src in srcs:
+            src.close()
+
+
+def cached_frame_cube(
+    geotiff_paths: List[Path], cache_dir: Path, overview_resampling: str = "nearest"
+) -> Path:
+    """
+    Build the frame cube of a list of frames, unless it is already in ``cache_dir``.
+
+    The cube is named after the SHA-256 of the paths, sizes and modification times of the
+    frames and the conversion options, and the overview resampling. The other cubes of
+    the same resampling in ``cache_dir`` are removed; cubes of another resampling, e.g. of
+    another layer on the same frames, and builds in progress are left alone.
+
+    Returns:
+        Path: The path of the cube.
+    """
+    digest = hashlib.sha256(overview_resampling.encode())
+    for path in geotiff_paths:
+        stat = os.stat(path)
+        digest.update(json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns]).encode())
+    cube_path = Path(cache_dir) / f"{digest.hexdigest()[:32]}.{overview_resampling}.tif"
+    if not cube_path.exists():
+        build_frame_cube(geotiff_paths, cube_path, overview_resampling)
+
+    for path in Path(cache_dir).glob(f"*.{overview_resampling}.tif"):
+        if path != cube_path:
+            path.unlink(missing_ok=True)
+    return cube_path
+
+
+def open_frame_cube(cube_path: Path, chunks: Optional[int] = None):
+    """
+    Open a frame cube as the lazy (time, y, x) DataArray the xarray tile engine expects,
+    with the frame file names as time coordinates and nodata masked.
+
+    Args:
+        cube_path (Path): The path of the cube.
+        chunks (int, optional): Dask chunk size along x and y, all frames in every chunk.
+            Defaults to the internal tile size of the cube.
+
+    Returns:
+        xarray.DataArray: The frames.
+    """
+    import rioxarray
+
+    size = chunks or CUBE_BLOCK_SIZE
+    cube = rioxarray.open_rasterio(cube_path, chunks={"band": -1, "y": size, "x": size})
+    with rasterio.open(cube_path) as src:
+        names = list(src.descriptions)
+    cube = cube.rename(band="time").assign_coords(time=names)
+    nodata = cube.rio.nodata
+    if nodata is not None and not np.isnan(nodata):
+        cube = cube.where(cube != nodata)
+    return cube
@@ -2,24 +2,87 @@
 Helper functions for raster operations.
 """
 
+import math
+from contextlib import contextmanager
+from typing import NamedTuple, Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
 import rasterio
+import rasterio.features
+import shapely
+from affine import Affine
 from rasterio.io import MemoryFile
-from rasterio.warp import Resampling, calculate_default_transform, reproject
+from rasterio.warp import (
+    Resampling,
+    calculate_default_transform,
+    reproject,
+    transform_bounds,
+    transform_geom,
+)
+
+
+class RasterInfo(NamedTuple):
+    """Metadata of a raster: bounds in EPSG:4326, band count, data type and grid."""
+
+    bounds: Tuple[float, float, float, float]
+    count: int
+    dtype: str
+    crs: Optional[str]
+    transform: Tuple[float, ...]
+    width: int
+    height: int
+    nodata: Optional[float]
+
+
+def raster_info_in_4326(input_path):
+    """Read the EPSG:4326 bounds, band count, data type and grid of a raster without reading
+    pixels.
 
+    The bounds are reprojected with densified edges, so they enclose the whole raster even
+    when its edges curve in EPSG:4326.
 
+    Args:
+        input_path (str): The file path to the input raster.
+
+    Returns:
+        RasterInfo: The bounds (west, south, east, north), band count, data type, CRS, affine
+            transform coefficients, size and nodata value.
+    """
+    with rasterio.open(input_path) as src:
+        bounds = tuple(src.bounds)
+        if src.crs != "EPSG:4326":
+            bounds = transform_bounds(src.crs, "EPSG:4326", *bounds, densify_pts=21)
+        return RasterInfo(
+            tuple(bounds),
+            src.count,
+            src.dtypes[0],
+            src.crs.to_string() if src.crs else None,
+            tuple(src.transform)[:6],
+            src.width,
+            src.height,
+            src.nodata,
+        )
+
+
+@contextmanager
 def open_raster_in_4326(input_path):
     """Open a raster file and reproject it to EPSG:4326 if it's not already in that CRS.
 
+    Every band is warped into memory, so only use this when the reprojected pixels are
+    needed; ``raster_info_in_4326`` reads the bounds and band count alone. The dataset and
+    its in-memory file are closed when the context exits.
+
     Args:
         input_path (str): The file path to the input raster.
 
-    Returns:
+    Yields:
         rasterio.io.DatasetReader: The opened (and possibly reprojected) raster dataset.
     """
     with rasterio.open(input_path) as src:
         if src.crs == "EPSG:4326":
-            print("Already in EPSG:4326")
-            return src
+            yield src
+            return
 
         transform, width, height = calculate_default_transform(
             src.crs, "EPSG:4326", src.width, src.height, *src.bounds
@@ -31,18 +94,79 @@ def open_raster_in_4326(input_path):
         )
 
         # Create in-memory raster
-        memfile = MemoryFile()
-        dst = memfile.open(**kwargs)
-
-        for i in range(1, src.count + 1):
-            reproject(
-                source=rasterio.band(src, i),
-                destination=rasterio.band(dst, i),
-                src_transform=src.transform,
-                src_crs=src.crs,
-                dst_transform=transform,
-                dst_crs="EPSG:4326",
-                resampling=Resampling.nearest,
-            )
-
-    return dst
+        with MemoryFile() as memfile, memfile.open(**kwargs) as dst:
+            for i in range(1, src.count + 1):
+                reproject(
+                    source=rasterio.band(src, i),
+                    destination=rasterio.band(dst, i),
+                    src_transform=src.transform,
+                    src_crs=src.crs,
+                    dst_transform=transform,
+                    dst_crs="EPSG:4326",
+                    resampling=Resampling.nearest,
+                )
+
+            yield dst
+
+
+def mask_footprint(mask, transform, crs, buffer_pixels=1):
+    """Vectorise a valid-data mask into a footprint polygon in EPSG:4326.
+
+    Args:
+        mask (numpy.ndarray): 2D array, non-zero where the raster has data.
+        transform (affine.Affine): The affine transform of the mask.
+        crs: The CRS of the mask.
+        buffer_pixels (int): Grow the footprint by this many pixels so that data at its
+            edges is not lost when the mask is coarser than the raster.
+
+    Returns:
+        shapely.Geometry: The footprint, empty if the mask has no data.
+    """
+    valid = np.asarray(mask) > 0
+    if not valid.any():
+        return shapely.Polygon()
+
+    shapes = rasterio.features.shapes(valid.astype("uint8"), mask=valid, transform=transform)
+    footprint = shapely.union_all([shapely.geometry.shape(geom) for geom, _ in shapes])
+
+    pixel_size = max(abs(transform.a), abs(transform.e))
+    footprint = footprint.buffer(pixel_size * buffer_pixels)
+    if crs == "EPSG:4326":
+        return footprint
+
+    # Add vertices along the edges so they follow the reprojection
+    footprint = shapely.segmentize(footprint, pixel_size * 16)
+    return shapely.geometry.shape(transform_geom(crs, "EPSG:4326", footprint.__geo_interface__))
+
+
+def valid_data_footprint(input_path, max_size=1024):
+    """Compute the valid-data footprint of a raster file in EPSG:4326.
+
+    The mask is read at reduced resolution, at most ``max_size`` pixels wide or high.
+
+    Args:
+        input_path (str): The file path to the input raster.
+        max_size (int): Maximum size of the mask that is vectorised.
+
+    Returns:
+        shapely.Geometry: The footprint, empty if the raster has no data.
+    """
+    with rasterio.open(input_path) as src:
+        scale = max(1, math.ceil(max(src.width, src.height) / max_size))
+        width, height = math.ceil(src.width / scale), math.ceil(src.height / scale)
+        # Average keeps coarse pixels that are only partly valid
+        mask = src.dataset_mask(out_shape=(height, width), resampling=Resampling.average)
+        transform = src.transform * Affine.scale(src.width / width, src.height / height)
+        return mask_footprint(mask, transform, src.crs)
+
+
+def vector_footprint(vector_file):
+    """Read the union of the geometries of a vector file in EPSG:4326.
+
+    Args:
+        vector_file (str): The file path to the vector file.
+
+    Returns:
+        shapely.Geometry: The footprint.
+    """
+    return gpd.read_file(vector_file).to_crs("EPSG:4326").union_all()
@@ -4,6 +4,7 @@ import glob
 import os
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import NoCredentialsError
 from rich.console import Console
 from rich.progress import (
@@ -16,6 +17,12 @@ from rich.progress import (
 
 console = Console()
 
+# Content types of single-file tile archives
+ARCHIVE_CONTENT_TYPES = {
+    ".pmtiles": "application/vnd.pmtiles",
+    ".mbtiles": "application/vnd.sqlite3",
+}
+
 
 def _get_s3_client(environment="staging"):
     """Get configured S3 client."""
@@ -113,6 +120,54 @@ def upload_local_directory_to_s3(local_path, destination_blob_path, environment=
     )
 
 
+def upload_tile_archive_to_s3(local_file, destination_blob_path, environment="staging"):
+    """Uploads a single-file tile archive (PMTiles or MBTiles) to the bucket.
+
+    The archive is sent as one multipart upload instead of one request per tile.
+    Args:
+        local_file (str): Local path to the ``.pmtiles`` or ``.mbtiles`` archive.
+        destination_blob_path (str): S3 key of the uploaded archive.
+    """
+    console.print(
+        f"🚀 [bold white]Uploading tile archive to S3 From:[cyan] {local_file}\n"
+        f"To: {destination_blob_path}"
+    )
+
+    s3_client = _get_s3_client(environment)
+    bucket_name = _get_bucket_name(environment)
+
+    local_file = str(local_file)
+    extension = os.path.splitext(local_file)[1]
+    extra_args = {"ContentType": ARCHIVE_CONTENT_TYPES.get(extension, "application/octet-stream")}
+    # Large parts uploaded concurrently: archives are usually hundreds of MB
+    config = TransferConfig(multipart_chunksize=64 * 1024 * 1024, max_concurrency=16)
+    size = os.path.getsize(local_file)
+
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        TimeElapsedColumn(),
+        console=console,
+    ) as progress:
+        upload_task = progress.add_task(f"Uploading {size / 1e6:.1f} MB...", total=size)
+        try:
+            s3_client.upload_file(
+                local_file,
+                bucket_name,
+                destination_blob_path,
+                ExtraArgs=extra_args,
+                Config=config,
+                Callback=lambda sent: progress.advance(upload_task, sent),
+            )
+        except NoCredentialsError:
+            console.print("[red]✗ No AWS credentials found[/red]")
+            return
+
+    console.print(f"[bold green]✅ Successfully uploaded {local_file}![/bold green]")
+
+
 def delete_s3_folder(folder_path, environment="staging"):
     """Deletes an entire folder (prefix) from the S3 bucket.
     Args: